@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Measures how many analyses per second simplehttp can serve.
+
+Requests are submitted by a thread pool, as simplehttp does, and analysed
+either in those threads or in analysis pools of each size. Every request
+gets a log with a different last line so the result cache never answers
+it. Pools are started and warmed up before timing, as the server keeps
+them.
+
+Usage: benchmarks/bench_analysis_pool.py --file LOG [--processes 1,2,4] [--requests 64] [--concurrency 16]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import loganalyzer  # noqa: E402
+
+
+def serve(text, requests, concurrency, pool, offset):
+    """Returns the requests/s of analysing requests distinct copies of text."""
+    def request(i):
+        logLines = loganalyzer.LogBuffer('{}\nrequest {}'.format(text, offset + i))
+        return loganalyzer.analyzeLines(loganalyzer.getDescription(logLines), logLines, analysisPool=pool)
+
+    with ThreadPoolExecutor(concurrency) as threads:
+        start = time.perf_counter()
+        list(threads.map(request, range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest="file", required=True, help="local filename with log")
+    parser.add_argument("--processes", "-p", dest="processes", default="1,2,4", help="comma separated pool sizes")
+    parser.add_argument("--requests", "-n", dest="requests", default=64, type=int, help="analyses per variant")
+    parser.add_argument("--concurrency", "-c", dest="concurrency", default=16, type=int, help="requests in flight")
+    flags = parser.parse_args()
+
+    with open(flags.file, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read().rstrip('\n')
+    print("{} CPUs, {} requests, {} in flight".format(os.cpu_count(), flags.requests, flags.concurrency))
+
+    threads = serve(text, flags.requests, flags.concurrency, None, 0)
+    print("{:>10} {:8.1f} req/s".format("threads", threads))
+    for i, processes in enumerate(int(p) for p in flags.processes.split(',')):
+        pool = loganalyzer.startAnalysisPool(processes)
+        serve(text, processes, processes, pool, -processes)  # starts and warms up the workers
+        rate = serve(text, flags.requests, flags.concurrency, pool, (i + 1) * flags.requests)
+        print("{:>10} {:8.1f} req/s x{:4.2f}".format("{} procs".format(processes), rate, rate / threads))
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Compares the per-term search() scans with the single-sweep term matcher.
+
+Usage: benchmarks/bench_matcher.py --file LOG [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import loganalyzer  # noqa: E402  registers every check's search terms
+from checks.utils import matcher  # noqa: E402
+from checks.utils.logindex import LogIndex  # noqa: E402
+from checks.utils.utils import search  # noqa: E402
+
+
+def timeit(func, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest="file", required=True, help="local filename with log")
+    parser.add_argument("--repeat", "-r", dest="repeat", default=3, type=int, help="runs per variant, best is reported")
+    flags = parser.parse_args()
+
+    with open(flags.file, "r") as f:
+        lines = f.read().split('\n')
+    terms = sorted(matcher.registeredTerms)
+    print("{} lines, {} registered terms".format(len(lines), len(terms)))
+
+    def perTermSearch():
+        return {t: search(t, lines) for t in terms}
+
+    def indexFind():
+        index = LogIndex(lines)
+        return {t: index.search(t) for t in terms}
+
+    def sweep(m):
+        index = LogIndex(lines)
+        index.prime(m)
+        return {t: index.search(t) for t in terms}
+
+    variants = [("search() per term", perTermSearch), ("LogIndex str.find per term", indexFind)]
+    accelerated = matcher.TermMatcher(terms)
+    if accelerated.accelerated:
+        variants.append(("TermMatcher (pyahocorasick)", lambda: sweep(accelerated)))
+    pure = matcher.TermMatcher(terms, accelerated=False)
+    variants.append(("TermMatcher (pure Python)", lambda: sweep(pure)))
+
+    reference = None
+    for name, func in variants:
+        elapsed, result = timeit(func, flags.repeat)
+        if reference is None:
+            reference = (elapsed, result)
+        status = "ok" if result == reference[1] else "MISMATCH"
+        print("{:<30} {:8.3f}s  x{:5.2f}  {}".format(name, elapsed, reference[0] / elapsed, status))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Compares sequential analysis with searching the log in a process pool.
+
+The log is repeated or truncated to each size, analysed once sequentially
+and once per pool size, and the smallest size at which each pool beats the
+sequential run is reported as its crossover point. Pools are started before
+timing, as a server would keep them.
+
+Usage: benchmarks/bench_parallel.py --file LOG [--sizes 1,4,16,64] [--jobs 2,4] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import loganalyzer  # noqa: E402  registers every check's search terms
+from checks.utils.parallel import ensureTracker  # noqa: E402
+
+
+def timeit(func, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def writeSized(data, size, f):
+    """Writes data to f, repeated or truncated to size bytes at a line end."""
+    written = 0
+    while written < size:
+        chunk = data[:size - written]
+        if len(chunk) < len(data):
+            chunk = chunk[:chunk.rfind(b'\n') + 1] or chunk
+        f.write(chunk)
+        written += len(chunk)
+    f.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", "-f", dest="file", required=True, help="local filename with log")
+    parser.add_argument("--sizes", dest="sizes", default="1,4,16,64", help="comma separated log sizes in MB")
+    parser.add_argument("--jobs", "-j", dest="jobs", default="2,4", help="comma separated pool sizes")
+    parser.add_argument("--repeat", "-r", dest="repeat", default=3, type=int, help="runs per variant, best is reported")
+    flags = parser.parse_args()
+
+    with open(flags.file, "rb") as f:
+        data = f.read()
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    sizes = [float(s) for s in flags.sizes.split(',')]
+    jobs = [int(j) for j in flags.jobs.split(',')]
+    print("{} CPUs".format(os.cpu_count()))
+
+    ensureTracker()
+    pools = {}
+    for j in jobs:
+        pools[j] = ProcessPoolExecutor(j)
+        list(pools[j].map(abs, range(j)))
+
+    crossover = {}
+    print("{:>8} {:>10}".format("MB", "sequential") + "".join("{:>16}".format("{} jobs".format(j)) for j in jobs))
+    for size in sizes:
+        with tempfile.NamedTemporaryFile(suffix=".txt") as f:
+            writeSized(data, int(size * 1024 * 1024), f)
+            sequential, reference = timeit(lambda: loganalyzer.doAnalysis(filename=f.name), flags.repeat)
+            row = "{:8.1f} {:9.3f}s".format(size, sequential)
+            for j in jobs:
+                elapsed, result = timeit(lambda: loganalyzer.doAnalysis(filename=f.name, executor=pools[j]), flags.repeat)
+                status = "" if result == reference else " MISMATCH"
+                row += "{:9.3f}s x{:4.2f}{}".format(elapsed, sequential / elapsed, status)
+                if elapsed < sequential and j not in crossover:
+                    crossover[j] = size
+            print(row)
+
+    for j in jobs:
+        if j in crossover:
+            print("{} jobs: faster from {} MB".format(j, crossover[j]))
+        else:
+            print("{} jobs: never faster at these sizes".format(j))
+    for pool in pools.values():
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
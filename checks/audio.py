@@ -6,6 +6,13 @@ from .vars import *
 from .utils.utils import *
 
 
+registerTerms(
+    'audio_monitor_init_wasapi: Failed',
+    'Max audio buffering reached!',
+    'total audio buffering is now',
+)
+
+
 audiobuf_re = re.compile(r"""
     (?i)
     adding \s (?P<added> \d+) \s milliseconds \s of \s audio \s buffering
@@ -19,6 +26,7 @@ audiobuf_re = re.compile(r"""
     """, re.VERBOSE)
 
 
+@check(triggers=('audio_monitor_init_wasapi: Failed',))
 def checkMonitoringDevice(lines):
     if search('audio_monitor_init_wasapi: Failed', lines):
         return [
@@ -38,54 +46,65 @@ def checkMonitoringDevice(lines):
         ]
 
 
-def checkAudioBuffering(lines):
-    maxBuffering = searchWithIndex('Max audio buffering reached!', lines)
-    if (len(maxBuffering) > 0):
-        # This doesn't correspond to a specific amount of time -- it's
-        # emitted if the delay is greater than MAX_BUFFERING_TICKS, and that
-        # amount of time varies by sample rate. Unfortunately, the max
-        # buffering reached message doesn't directly say which audio source
-        # was the offender. Is it worth just ditching this check and using
-        # the "greater than 500ms" check, which could potentially also easily
-        # know the specific device?
-        append = ""
-        for line, index in maxBuffering:
-            if (len(lines) > index):
-                m = audiobuf_re.search(lines[index + 1].replace('\r', ''))
-                if m and m.group("source"):
-                    append += (
-                        "<br><br>"
-                        + _("Source affected (potential cause):")
-                        + "<strong>"
-                        + m.group("source")
-                        + "</strong>"
-                    )
-                    break
-        return [
-            LEVEL_INFO,
-            _("Max Audio Buffering"),
-            _(
-                "Audio buffering hit the maximum value. This can be an indicator of very high system load and may affect stream latency or cause individual audio sources to stop working. Keep an eye on CPU usage especially, and close background programs if needed."
-            )
-            + "<br><br>"
-            + _(
-                "Occasionally, this can be caused by incorrect device timestamps. Restart OBS to reset buffering."
-            )
-            + append,
-        ]
+class AudioBufferingConsumer(Consumer):
+    terms = ('Max audio buffering reached!', 'total audio buffering is now')
+    # the line after 'Max audio buffering reached!' may name the source
+    context = 1
 
-    buffering = search('total audio buffering is now', lines)
-    vals = [0, ]
-    if (len(buffering) > 0):
-        for i in buffering:
-            m = audiobuf_re.search(i)
+    def __init__(self):
+        self.maxReached = False
+        self.afterMax = False
+        self.source = None
+        self.maxTotal = 0
+
+    def feed(self, line):
+        if (self.afterMax and self.source is None):
+            m = audiobuf_re.search(line.replace('\r', ''))
+            if m and m.group("source"):
+                self.source = m.group("source")
+        self.afterMax = 'Max audio buffering reached!' in line
+        if self.afterMax:
+            self.maxReached = True
+        elif 'total audio buffering is now' in line:
+            m = audiobuf_re.search(line)
             if m:
                 try:
-                    vals.append(int(m.group("total")))
+                    self.maxTotal = max(self.maxTotal, int(m.group("total")))
                 except (ValueError, OverflowError):
                     pass
 
-        if (max(vals) > 500):
+    def finish(self):
+        if (self.maxReached):
+            # This doesn't correspond to a specific amount of time -- it's
+            # emitted if the delay is greater than MAX_BUFFERING_TICKS, and that
+            # amount of time varies by sample rate. Unfortunately, the max
+            # buffering reached message doesn't directly say which audio source
+            # was the offender. Is it worth just ditching this check and using
+            # the "greater than 500ms" check, which could potentially also easily
+            # know the specific device?
+            append = ""
+            if (self.source is not None):
+                append += (
+                    "<br><br>"
+                    + _("Source affected (potential cause):")
+                    + "<strong>"
+                    + self.source
+                    + "</strong>"
+                )
+            return [
+                LEVEL_INFO,
+                _("Max Audio Buffering"),
+                _(
+                    "Audio buffering hit the maximum value. This can be an indicator of very high system load and may affect stream latency or cause individual audio sources to stop working. Keep an eye on CPU usage especially, and close background programs if needed."
+                )
+                + "<br><br>"
+                + _(
+                    "Occasionally, this can be caused by incorrect device timestamps. Restart OBS to reset buffering."
+                )
+                + append,
+            ]
+
+        if (self.maxTotal > 500):
             return [
                 LEVEL_INFO,
                 _("High Audio Buffering"),
@@ -94,4 +113,9 @@ def checkAudioBuffering(lines):
                 ),
             ]
 
-    return None
+        return None
+
+
+@check(triggers=('audio buffering',), consumer=AudioBufferingConsumer)
+def checkAudioBuffering(lines):
+    return consumeLines(AudioBufferingConsumer(), lines)
@@ -8,6 +8,19 @@ from .vars import *
 from .utils.utils import *
 
 
+registerTerms(
+    ': Open Broadcaster Software v0.',
+    'Unhandled exception:',
+    'Warning: OBS is already running!',
+    'Auto-config wizard',
+    'CPU Name',
+    'OBS',
+    'Portable mode: true',
+    'Safe Mode enabled.',
+    'not on safe list',
+)
+
+
 def checkClassic(lines):
     if (len(search(': Open Broadcaster Software v0.', lines)) > 0):
         return True, [
@@ -43,6 +56,7 @@ def checkCrash(lines):
         return False, [LEVEL_NONE, _("OBS Studio Log"), _("Nothing to say")]
 
 
+@check(triggers=('Warning: OBS is already running!',))
 def checkDual(lines):
     if (len(search('Warning: OBS is already running!', lines)) > 0):
         return [
@@ -54,6 +68,7 @@ def checkDual(lines):
         ]
 
 
+@check(triggers=('Auto-config wizard',))
 def checkAutoconfig(lines):
     if (len(search('Auto-config wizard', lines)) > 0):
         return [
@@ -66,6 +81,7 @@ def checkAutoconfig(lines):
         ]
 
 
+@check(triggers=('CPU Name',), region='header')
 def checkCPU(lines):
     cpu = search('CPU Name', lines)
     if (len(cpu) > 0):
@@ -87,17 +103,21 @@ def checkCPU(lines):
             ]
 
 
+@fact('obs_version_line')
 def getOBSVersionLine(lines):
     versionPattern = re.compile(r': OBS \d+\.\d+\.\d+')
     versionLines = search('OBS', lines)
     for line in versionLines:
         if versionPattern.search(line):
             return line
-    return versionLines[-1]
+    return versionLines[-1] if versionLines else None
 
 
+@fact('obs_version')
 def getOBSVersionString(lines):
-    versionLine = getOBSVersionLine(lines)
+    versionLine = getFacts(lines).obs_version_line
+    if versionLine is None:
+        return None
     versionString = versionLine[versionLine.find("OBS"):]
     return versionString.split()[1]
 
@@ -117,8 +137,9 @@ obsver_re = re.compile(r"""
     """, re.VERBOSE)
 
 
+@check(triggers=('OBS',))
 def checkObsVersion(lines):
-    versionString = getOBSVersionString(lines)
+    versionString = getFacts(lines).obs_version
 
     if parse_version(versionString) == parse_version('21.1.0'):
         return [
@@ -211,6 +232,7 @@ def checkObsVersion(lines):
         ]
 
 
+@fact('os')
 def checkOperatingSystem(lines):
     firstSection = lines[:getSubSections(lines)[0]]
     for s in firstSection:
@@ -222,6 +244,7 @@ def checkOperatingSystem(lines):
             return "linux"
 
 
+@check(triggers=('Portable mode: true',), region='header')
 def checkPortableMode(lines):
     if search('Portable mode: true', lines):
         return [
@@ -233,6 +256,7 @@ def checkPortableMode(lines):
         ]
 
 
+@check(triggers=('Safe Mode enabled.',))
 def checkSafeMode(lines):
     if search('Safe Mode enabled.', lines):
         modulesNotLoaded = search('not on safe list', lines)
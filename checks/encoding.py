@@ -5,9 +5,36 @@ from .utils.utils import *
 import re
 
 
+registerTerms(
+    '== Recording Start ==',
+    '== Streaming Start ==',
+    '== Replay Buffer Start ==',
+    'Writing file ',
+    'movflags=frag_keyframe+empty_moov+delay_moov',
+    'x264 encoder:',
+    'preset: ',
+    "'adv_ffmpeg_output':",
+    "stream'] settings:",
+    'video settings reset:',
+    'Failed to open NVENC codec',
+    'Error encoding with encoder',
+    '[x264 encoder:',
+    '[jim-nvenc:',
+    '[NVENC encoder:',
+    '[AMF] [H264]',
+    '[AMF] [H265]',
+    '[qsv encoder:',
+    '[VideoToolbox recording_h264:',
+    '[VideoToolbox streaming_h264:',
+    'skipped frames',
+    'Encoder ID',
+)
+
+
 params_re = re.compile(r"\t(?P<key>\w+):\s*(?P<value>\S+)")
 
 
+@check()
 def checkAttempt(lines):
     recordingStarts = search('== Recording Start ==', lines)
     streamingStarts = search('== Streaming Start ==', lines)
@@ -23,6 +50,7 @@ def checkAttempt(lines):
         ]
 
 
+@check(triggers=('Writing file ',))
 def checkMP4(lines):
     writtenFiles = search('Writing file ', lines)
     mp4 = search('.mp4', writtenFiles)
@@ -42,6 +70,7 @@ def checkMP4(lines):
         ]
 
 
+@check(triggers=('x264 encoder:',))
 def checkPreset(lines):
     encoderLines = search('x264 encoder:', lines)
     presets = search('preset: ', lines)
@@ -60,6 +89,7 @@ def checkPreset(lines):
         ]
 
 
+@check(triggers=("'adv_ffmpeg_output':",))
 def checkCustom(lines):
     encoderLines = search("'adv_ffmpeg_output':", lines)
     if (len(encoderLines) > 0):
@@ -72,6 +102,7 @@ def checkCustom(lines):
         ]
 
 
+@check(triggers=("stream'] settings:",))
 def checkStreamSettings(lines):
     streamingSessions = searchWithIndex("stream'] settings:", lines)
     if streamingSessions:
@@ -121,6 +152,7 @@ def checkStreamSettings(lines):
             ]
 
 
+@check(triggers=('Failed to open NVENC codec',))
 def checkNVENC(lines):
     msgs = search("Failed to open NVENC codec", lines)
     if (len(msgs) > 0):
@@ -145,6 +177,7 @@ def checkNVENC(lines):
         ]
 
 
+@check(triggers=('Error encoding with encoder',))
 def checkEncodeError(lines):
     if (len(search('Error encoding with encoder', lines)) > 0):
         return [
@@ -156,84 +189,99 @@ def checkEncodeError(lines):
         ]
 
 
+class EncodingConsumer(MaxPercentConsumer):
+    encoderTerms = {
+        'x264': ('[x264 encoder:',),
+        'NVENC': ('[jim-nvenc:', '[NVENC encoder:'),
+        'AMD': ('[AMF] [H264]', '[AMF] [H265]'),
+        'QSV': ('[qsv encoder:',),
+        'APPLE': ('[VideoToolbox recording_h264:', '[VideoToolbox streaming_h264:'),
+    }
+    terms = ('skipped frames',) + tuple(t for terms in encoderTerms.values() for t in terms)
+
+    def __init__(self):
+        super().__init__()
+        self.encoders = set()
+
+    def feed(self, line):
+        if 'skipped frames' in line:
+            super().feed(line)
+        for encoder, terms in self.encoderTerms.items():
+            if encoder not in self.encoders and any(t in line for t in terms):
+                self.encoders.add(encoder)
+
+    def finish(self):
+        val = self.val
+        severity = 9000
+        hasx264 = 'x264' in self.encoders
+        hasHardware = len(self.encoders - {'x264'}) > 0
+        if (val != 0):
+            if (val >= 15):
+                severity = LEVEL_CRITICAL
+            elif (15 > val and val >= 5):
+                severity = LEVEL_WARNING
+            else:
+                severity = LEVEL_INFO
+            if (hasx264 and hasHardware):
+                return [
+                    severity,
+                    _("{}% Encoder Overload").format(val),
+                    _(
+                        "Encoder overload may be related to your CPU or GPU being overloaded, depending on the encoder in question. If you are using a software encoder (x264) please see the {}CPU Overload Guide{}. If you are using a hardware encoder (AMF, QSV/Quicksync, NVENC) please see the {}GPU Overload Guide{}."
+                        ""
+                    ).format(
+                        '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
+                        "</a>",
+                        '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
+                        "</a>",
+                    ),
+                ]
+            elif (hasx264):
+                return [
+                    severity,
+                    _("{}% CPU Encoder Overload").format(val),
+                    _(
+                        "The encoder is skipping frames because of CPU overload. Read about {}General Performance and Encoding Issues{}."
+                    ).format(
+                        '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
+                        "</a>",
+                    ),
+                ]
+            elif (hasHardware):
+                return [
+                    severity,
+                    _("{}% GPU Encoder Overload").format(val),
+                    _(
+                        "The encoder is skipping frames because of GPU overload. Read about troubleshooting tips in our {}GPU Overload Guide{}."
+                    ).format(
+                        '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
+                        "</a>",
+                    ),
+                ]
+            else:
+                return [
+                    severity,
+                    _("{}% Encoder Overload").format(val),
+                    _(
+                        "Encoder overload may be related to your CPU or GPU being overloaded, depending on the encoder in question. If you are using a software encoder (x264) please see the {}CPU Overload Guide{}. If you are using a hardware encoder (AMF, QSV/Quicksync, NVENC) please see the {}GPU Overload Guide{}."
+                    ).format(
+                        '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
+                        "</a>",
+                        '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
+                        "</a>",
+                    ),
+                ]
+
+
+@check(triggers=('skipped frames',), consumer=EncodingConsumer)
 def checkEncoding(lines):
-    hasx264 = len(search('[x264 encoder:', lines))
-    hasNVENC = (len(search('[jim-nvenc:', lines)) + len(search('[NVENC encoder:', lines)))
-    hasAMD = (len(search('[AMF] [H264]', lines)) + len(search('[AMF] [H265]', lines)))
-    hasQSV = len(search('[qsv encoder:', lines))
-    hasAPPLE = (len(search('[VideoToolbox recording_h264:', lines)) + len(search('[VideoToolbox streaming_h264:', lines)))
-    drops = search('skipped frames', lines)
-    val = 0
-    severity = 9000
-    for drop in drops:
-        try:
-            v = float(drop[drop.find("(") + 1: drop.find(")")
-                           ].strip('%').replace(",", "."))
-        except (ValueError, OverflowError):
-            v = 0
-        if (v > val):
-            val = v
-    if (val != 0):
-        if (val >= 15):
-            severity = LEVEL_CRITICAL
-        elif (15 > val and val >= 5):
-            severity = LEVEL_WARNING
-        else:
-            severity = LEVEL_INFO
-        if (hasx264 > 0 and (hasAMD + hasQSV + hasNVENC + hasAPPLE) > 0):
-            return [
-                severity,
-                _("{}% Encoder Overload").format(val),
-                _(
-                    "Encoder overload may be related to your CPU or GPU being overloaded, depending on the encoder in question. If you are using a software encoder (x264) please see the {}CPU Overload Guide{}. If you are using a hardware encoder (AMF, QSV/Quicksync, NVENC) please see the {}GPU Overload Guide{}."
-                    ""
-                ).format(
-                    '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
-                    "</a>",
-                    '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
-                    "</a>",
-                ),
-            ]
-        elif (hasx264 > 0):
-            return [
-                severity,
-                _("{}% CPU Encoder Overload").format(val),
-                _(
-                    "The encoder is skipping frames because of CPU overload. Read about {}General Performance and Encoding Issues{}."
-                ).format(
-                    '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
-                    "</a>",
-                ),
-            ]
-        elif ((hasNVENC + hasAMD + hasQSV + hasAPPLE) > 0):
-            return [
-                severity,
-                _("{}% GPU Encoder Overload").format(val),
-                _(
-                    "The encoder is skipping frames because of GPU overload. Read about troubleshooting tips in our {}GPU Overload Guide{}."
-                ).format(
-                    '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
-                    "</a>",
-                ),
-            ]
-        else:
-            return [
-                severity,
-                _("{}% Encoder Overload").format(val),
-                _(
-                    "Encoder overload may be related to your CPU or GPU being overloaded, depending on the encoder in question. If you are using a software encoder (x264) please see the {}CPU Overload Guide{}. If you are using a hardware encoder (AMF, QSV/Quicksync, NVENC) please see the {}GPU Overload Guide{}."
-                ).format(
-                    '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
-                    "</a>",
-                    '<a href="https://obsproject.com/kb/encoding-performance-troubleshooting">',
-                    "</a>",
-                ),
-            ]
+    return consumeLines(EncodingConsumer(), lines)
 
 
 unknownenc_re = re.compile(r"Encoder\sID\s'(?P<name>.+)'\snot\sfound")
 
 
+@check(triggers=('Encoder ID',))
 def checkUnknownEncoder(lines):
     encLines = search('Encoder ID', lines)
     outdatedEncMac = ['vt_h264_sw', 'vt_h264_hw']
@@ -4,6 +4,19 @@ from .vars import *
 from .utils.utils import *
 
 
+registerTerms(
+    'Failed to initialize video',
+    'rendering lag',
+    'The AMF Runtime is very old and unsupported',
+    '[jim-nvenc] Current driver version does not support this NVENC version, please upgrade your driver',
+    '[NVENC] Test process failed: outdated_driver',
+    'Using EGL/X11',
+    'OpenGL loaded successfully, version 3.3.0 NVIDIA 390',
+    'video settings reset:',
+)
+
+
+@check(triggers=('Failed to initialize video',))
 def checkInit(lines):
     if search('Failed to initialize video', lines):
         return [
@@ -15,25 +28,26 @@ def checkInit(lines):
         ]
 
 
-def getRenderLag(lines):
-    drops = search('rendering lag', lines)
-    val = 0
-    severity = 9000
-    for drop in drops:
-        try:
-            v = float(drop[drop.find("(") + 1: drop.find(")")
-                           ].strip('%').replace(",", "."))
-        except (ValueError, OverflowError):
-            v = 0
-        if (v > val):
-            val = v
+class RenderLagConsumer(MaxPercentConsumer):
+    terms = ('rendering lag',)
+
 
-    return val
+class RenderLagCheckConsumer(RenderLagConsumer):
+    def finish(self):
+        return renderLagMessage(self.val)
 
 
+@fact('render_lag_pct')
+def getRenderLag(lines):
+    return consumeLines(RenderLagConsumer(), lines)
+
+
+@check(triggers=('rendering lag',), consumer=RenderLagCheckConsumer)
 def checkRenderLag(lines):
-    val = getRenderLag(lines)
+    return renderLagMessage(getFacts(lines).render_lag_pct)
+
 
+def renderLagMessage(val):
     if (val != 0):
         if (val >= 10):
             severity = LEVEL_CRITICAL
@@ -66,6 +80,7 @@ def checkRenderLag(lines):
         ]
 
 
+@check(triggers=('The AMF Runtime is very old and unsupported',))
 def checkAMDdrivers(lines):
     if search('The AMF Runtime is very old and unsupported', lines):
         return [
@@ -77,6 +92,7 @@ def checkAMDdrivers(lines):
         ]
 
 
+@check()
 def checkNVIDIAdrivers(lines):
     if (search('[jim-nvenc] Current driver version does not support this NVENC version, please upgrade your driver', lines) or search('[NVENC] Test process failed: outdated_driver', lines)):
         return [
@@ -88,6 +104,7 @@ def checkNVIDIAdrivers(lines):
         ]
 
 
+@check(triggers=('Using EGL/X11', 'OpenGL loaded successfully, version 3.3.0 NVIDIA 390'))
 def checkNVIDIAdriversEGL(lines):
     if not search('Using EGL/X11', lines):
         return
@@ -99,12 +116,10 @@ def checkNVIDIAdriversEGL(lines):
         ]
 
 
+@check(triggers=('video settings reset:',), multiple=True)
 def checkVideoSettings(lines):
-    videoSettings = []
+    videoSettings = searchPositions("video settings reset:", lines)
     res = []
-    for i, s in enumerate(lines):
-        if "video settings reset:" in s:
-            videoSettings.append(i)
     if (len(videoSettings) > 0):
         fmt = lines[videoSettings[-1] + 5].split()[-1]
         colorRange = lines[videoSettings[-1] + 6].split()[-1]
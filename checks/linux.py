@@ -4,6 +4,23 @@ from .vars import *
 from .utils.utils import *
 
 
+registerTerms(
+    'Session Type:',
+    'Window System:',
+    'Distribution:',
+    'Flatpak Runtime:',
+    '[pipewire] No capture',
+    'pipewire-desktop-capture-source',
+    'pipewire-window-capture-source',
+    'pipewire-screen-capture-source',
+    'Desktop Environment:',
+    'v4l2loopback not installed',
+    'obs-browser.so',
+    'obs-websocket.so',
+    'vlc-video.so',
+)
+
+
 def getSessionTypeLine(lines):
     sessionType = search('Session Type:', lines)
     if len(sessionType) > 0:
@@ -16,6 +33,7 @@ def getWindowSystemLine(lines):
         return windowSystem[0]
 
 
+@check(triggers=('Distribution:',), platform='linux', region='header')
 def checkDistro(lines):
     isDistroNix = search('Distribution:', lines)
 
@@ -29,6 +47,7 @@ def checkDistro(lines):
     return [LEVEL_INFO, distro, ""]
 
 
+@check(triggers=('Flatpak Runtime:',), platform='linux', region='header')
 def checkFlatpak(lines):
     isFlatpak = search('Flatpak Runtime:', lines)
 
@@ -42,6 +61,7 @@ def checkFlatpak(lines):
         ]
 
 
+@check(triggers=('Distribution:',), platform='linux', region='header')
 def checkSnapPackage(lines):
     isDistroNix = search('Distribution:', lines)
 
@@ -64,6 +84,7 @@ def checkSnapPackage(lines):
         ]
 
 
+@check(triggers=('Session Type:',), platform='linux')
 def checkWayland(lines):
     isDistroNix = search('Distribution:', lines)
     isFlatpak = search('Flatpak Runtime:', lines)
@@ -132,6 +153,7 @@ def checkWayland(lines):
     return [LEVEL_INFO, "Wayland", ""]
 
 
+@check(triggers=('Session Type:',), platform='linux')
 def checkX11Captures(lines):
     isDistroNix = search('Distribution:', lines)
     isFlatpak = search('Flatpak Runtime:', lines)
@@ -168,6 +190,7 @@ def checkX11Captures(lines):
     return [LEVEL_INFO, "X11", ""]
 
 
+@check(triggers=('Desktop Environment:',), platform='linux', region='header')
 def checkDesktopEnvironment(lines):
     isDistroNix = search('Distribution:', lines)
     isFlatpak = search('Flatpak Runtime:', lines)
@@ -188,6 +211,7 @@ def checkDesktopEnvironment(lines):
         return [LEVEL_INFO, desktopEnvironment, '']
 
 
+@check(triggers=('Distribution:',), platform='linux')
 def checkMissingModules(lines):
     isDistroNix = search('Distribution:', lines)
 
@@ -216,6 +240,7 @@ def checkMissingModules(lines):
         ]
 
 
+@check(triggers=('v4l2loopback not installed',), platform='linux')
 def checkLinuxVCam(lines):
     isDistroNix = search('Distribution:', lines)
     isFlatpak = search('Flatpak Runtime:', lines)
@@ -7,6 +7,15 @@ from .utils.utils import *
 from .utils.macosversions import *
 
 
+registerTerms(
+    'OS Name: Mac OS X',
+    'OS Name: macOS',
+    'OS Version:',
+    'Rosetta translation used: true',
+    '[macOS] Permission for',
+)
+
+
 def getMacVersionLine(lines):
     isMac = search('OS Name: Mac OS X', lines) + search('OS Name: macOS', lines)
     macVersion = search('OS Version:', lines)
@@ -14,6 +23,7 @@ def getMacVersionLine(lines):
         return macVersion[0]
 
 
+@fact('mac_version')
 def getMacVersion(lines):
     versionLine = getMacVersionLine(lines)
 
@@ -43,8 +53,9 @@ def getMacVersion(lines):
     return
 
 
+@check(triggers=('OS Version:',), platform='mac', region='header')
 def checkMacVer(lines):
-    verinfo = getMacVersion(lines)
+    verinfo = getFacts(lines).mac_version
     if not verinfo:
         return
 
@@ -73,6 +84,7 @@ def checkMacVer(lines):
     return [LEVEL_INFO, mv, msg]
 
 
+@check(triggers=('Rosetta translation used: true',), region='header')
 def checkRosettaTranslationStatus(lines):
     if (len(search('Rosetta translation used: true', lines)) > 0):
         return [
@@ -84,6 +96,7 @@ def checkRosettaTranslationStatus(lines):
         ]
 
 
+@check(triggers=('[macOS] Permission for',))
 def checkMacPermissions(lines):
     macPerms = search('[macOS] Permission for', lines)
     deniedPermissions = set()
@@ -6,18 +6,30 @@ from .vars import *
 from .utils.utils import *
 
 
-def checkDrop(lines):
-    drops = searchExclude('insufficient bandwidth', lines, ['test_stream'])
-    val = 0
+registerTerms(
+    'insufficient bandwidth',
+    'Interface: Killer',
+    'Lenovo Vantage / Legion Edge is installed.',
+    '802.11',
+    'Binding to ',
+    'Interface: ',
+    'Dynamic bitrate enabled',
+    'New socket loop enabled by user',
+    'Low latency mode enabled by user',
+    'second delay active',
+)
+
+
+class DropConsumer(MaxPercentConsumer):
+    terms = ('insufficient bandwidth',)
+    exclude = ('test_stream',)
+
+    def finish(self):
+        return dropMessage(self.val)
+
+
+def dropMessage(val):
     severity = 9000
-    for drop in drops:
-        try:
-            v = float(drop[drop.find("(") + 1: drop.find(")")
-                           ].strip('%').replace(",", "."))
-        except (ValueError, OverflowError):
-            v = 0
-        if (v > val):
-            val = v
     if (val != 0):
         if (val >= 15):
             severity = LEVEL_CRITICAL
@@ -37,6 +49,12 @@ def checkDrop(lines):
     ]
 
 
+@check(consumer=DropConsumer)
+def checkDrop(lines):
+    return consumeLines(DropConsumer(), lines)
+
+
+@check(triggers=('Interface: Killer',))
 def checkKiller(lines):
     if (len(search('Interface: Killer', lines)) > 0):
         return [
@@ -51,6 +69,7 @@ def checkKiller(lines):
         ]
 
 
+@check(triggers=('Lenovo Vantage / Legion Edge is installed.',))
 def checkVantage(lines):
     if (len(search('Lenovo Vantage / Legion Edge is installed.', lines)) > 0):
         return [
@@ -62,6 +81,7 @@ def checkVantage(lines):
         ]
 
 
+@check(triggers=('802.11',))
 def checkWifi(lines):
     if (len(search('802.11', lines)) > 0):
         return [
@@ -73,6 +93,7 @@ def checkWifi(lines):
         ]
 
 
+@check(triggers=('Binding to ',))
 def checkBind(lines):
     if (len(search('Binding to ', lines)) > 0):
         return [
@@ -87,6 +108,7 @@ def checkBind(lines):
 nicspeed_re = re.compile(r"(?i)Interface: (?P<nicname>.+) \(ethernet, ((?P<speed>\d+)|((?P<downspeed>\d+)↓/(?P<upspeed>\d+)↑)) mbps\)")
 
 
+@check(triggers=('Interface: ',))
 def checkNICSpeed(lines):
     nicLines = search('Interface: ', lines)
     if (len(nicLines) > 0):
@@ -113,6 +135,7 @@ def checkNICSpeed(lines):
     return None
 
 
+@check(triggers=('Dynamic bitrate enabled',))
 def checkDynamicBitrate(lines):
     dynBrLines = search('Dynamic bitrate enabled', lines)
     if (len(dynBrLines) > 0):
@@ -126,6 +149,7 @@ def checkDynamicBitrate(lines):
     return None
 
 
+@check(triggers=('New socket loop enabled by user',))
 def checkNetworkOptimizations(lines):
     networkOptimizationLines = search('New socket loop enabled by user', lines)
     if (len(networkOptimizationLines) > 0):
@@ -139,6 +163,7 @@ def checkNetworkOptimizations(lines):
     return None
 
 
+@check(triggers=('Low latency mode enabled by user',))
 def checkTCPPacing(lines):
     TCPPacingLines = search('Low latency mode enabled by user', lines)
     if (len(TCPPacingLines) > 0):
@@ -152,6 +177,7 @@ def checkTCPPacing(lines):
     return None
 
 
+@check(triggers=('second delay active',))
 def checkStreamDelay(lines):
     delayLines = search('second delay active', lines)
     if (len(delayLines) > 0):
@@ -5,6 +5,12 @@ from .utils.utils import *
 from .core import *
 import re
 
+
+registerTerms(
+    'due to possible import conflicts',
+)
+
+
 import_re = re.compile(r"""
     (?i)
     \/
@@ -13,6 +19,7 @@ import_re = re.compile(r"""
     """, re.VERBOSE)
 
 
+@check(triggers=('due to possible import conflicts',))
 def checkImports(lines):
     conflicts = search('due to possible import conflicts', lines)
     if (len(conflicts) > 0):
@@ -36,8 +43,12 @@ def checkImports(lines):
                 + append,
             ]
 
+
+@check(triggers=('Loaded Modules:',))
 def checkPluginList(lines):
-    if (getLoadedModules(lines) and checkOperatingSystem(lines)):
+    facts = getFacts(lines)
+    if (getLoadedModules(lines) and facts.os):
+        operatingSystem = facts.os
         commonPlugins = ['frontend-tools', 'vlc-video', 'obs-outputs', 'obs-vst', 'obs-ffmpeg', 'obs-browser', 'obs-transitions', 'decklink', 'decklink-captions', 'text-freetype2', 'decklink-output-ui', 'decklink-ouput-ui', 'aja', 'aja-output-ui', 'obs-x264', 'obs-websocket', 'obs-filters', 'image-source', 'rtmp-services', 'obs-webrtc', 'obs-nvenc', 'nv-filters']
         windowsPlugins = ['win-wasapi', 'win-mf', 'win-dshow', 'win-capture', 'obs-text', 'obs-qsv11', 'win-decklink', 'enc-amf', 'coreaudio-encoder']
         macPlugins = ['mac-virtualcam', 'mac-videotoolbox', 'mac-syphon', 'mac-capture', 'mac-avcapture', 'coreaudio-encoder', 'mac-avcapture-legacy']
@@ -53,11 +64,11 @@ def checkPluginList(lines):
                 thirdPartyPlugins.append(plugin)
 
         thirdPartyPlugins = set(thirdPartyPlugins).difference(commonPlugins)
-        if (checkOperatingSystem(lines) == "windows"):
+        if (operatingSystem == "windows"):
             thirdPartyPlugins = set(thirdPartyPlugins).difference(windowsPlugins)
-        elif (checkOperatingSystem(lines) == "mac"):
+        elif (operatingSystem == "mac"):
             thirdPartyPlugins = set(thirdPartyPlugins).difference(macPlugins)
-        elif (checkOperatingSystem(lines) == "linux"):
+        elif (operatingSystem == "linux"):
             thirdPartyPlugins = set(thirdPartyPlugins).difference(linuxPlugins)
         else:
             thirdPartyPlugins = []
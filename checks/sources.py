@@ -4,6 +4,17 @@ from .vars import *
 from .utils.utils import *
 
 
+registerTerms(
+    'user is forcing shared memory',
+    'Browser Hardware Acceleration: false',
+    '[obs-browser]: Blacklisted device detected, disabling browser source hardware acceleration',
+    ' - source:',
+    'User added source',
+    "Source ID 'browser_source' not found",
+)
+
+
+@check(triggers=('user is forcing shared memory',))
 def checkMulti(lines):
     mem = search('user is forcing shared memory', lines)
     if (len(mem) > 0):
@@ -54,6 +65,7 @@ def checkSources(lower, higher, lines):
     return res, violation
 
 
+@check()
 def checkBrowserAccel(lines):
     disabled = search('Browser Hardware Acceleration: false', lines)
     blacklisted = search('[obs-browser]: Blacklisted device detected, disabling browser source hardware acceleration', lines)
@@ -138,6 +150,7 @@ def parseScenes(lines):
     return ret
 
 
+@check(triggers=("Source ID 'browser_source' not found",))
 def checkBrowserSource(lines):
     browserComponents = search("Source ID 'browser_source' not found", lines)
     if (len(browserComponents) > 0):
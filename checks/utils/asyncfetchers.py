@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import aiohttp
+
+from . import fetchers
+from .fetchers import (getLinesGist, getDescriptionGist, getLinesHaste, getLinesObslog,
+                       getLinesPaste, getLinesDiscord, getDescription, logCache, pasteKey, cacheLog,
+                       loadStoredLog, storeLog, FetchError, PasteNotFound, checkStatus, isMissing, markMissing,
+                       BodyReader, rawUrl, discordMissing, getGistFile, NotModified, conditionalHeaders,
+                       updateValidators, revalidatedSites, staleLog, revalidatedLog)
+from .logbuffer import LogBuffer
+
+
+# Counterparts of the fetchers in fetchers.py for asyncio servers. They take
+# an aiohttp.ClientSession, so that downloads wait on the event loop rather
+# than blocking a thread each.
+
+
+async def getTextAsync(session, url, site, pasteId, missing=(404, 410), validators=None):
+    """Like getText(), but downloads url with session."""
+    headers = conditionalHeaders(validators)
+    async with session.get(url, headers=headers) as resp:
+        if resp.status == 304 and headers:
+            raise NotModified(url)
+        checkStatus(resp.status, site, pasteId, missing)
+        updateValidators(validators, resp.headers)
+        reader = BodyReader(site, pasteId, resp.headers.get('Content-Length'))
+        parts = []
+        async for chunk in resp.content.iter_chunked(fetchers.chunkSize):
+            parts.append(reader.decode(chunk))
+        parts.append(reader.decode(b'', True))
+        return ''.join(parts)
+
+
+async def getGistAsync(session, gistId, validators=None):
+    API_URL = "https://api.github.com"
+    return json.loads(await getTextAsync(session, '{0}/gists/{1}'.format(API_URL, gistId), 'gist', gistId, validators=validators))
+
+
+async def getGistLogAsync(session, gistId, validators=None):
+    """Like getGistLog(), but downloads the gist with session."""
+    gistObject = await getGistAsync(session, gistId, validators)
+    gistFile = getGistFile(gistObject)
+    if gistFile.get('truncated'):
+        logLines = LogBuffer(await getTextAsync(session, gistFile['raw_url'], 'gist', gistId))
+    else:
+        logLines = getLinesGist(gistObject)
+    return getDescriptionGist(gistObject), logLines
+
+
+async def getHasteAsync(session, hasteId):
+    API_URL = "https://hastebin.com"
+    return json.loads(await getTextAsync(session, '{0}/documents/{1}'.format(API_URL, hasteId), 'haste', hasteId))
+
+
+async def getObslogAsync(session, obslogId):
+    return await getTextAsync(session, rawUrl('obs', obslogId), 'obs', obslogId)
+
+
+async def getRawPasteAsync(session, obslogId, validators=None):
+    return await getTextAsync(session, rawUrl('pastebin', obslogId), 'pastebin', obslogId, validators=validators)
+
+
+async def getRawDiscordAsync(session, obslogId):
+    return await getTextAsync(session, rawUrl('discord', obslogId), 'discord', obslogId, discordMissing)
+
+
+async def getLogAsync(session, site, pasteId):
+    """Like getLog(), but downloads the paste with session."""
+    if site is None or isMissing(site, pasteId):
+        return None, None
+    log = logCache.get(pasteKey(site, pasteId))
+    if log is None:
+        if fetchers.logStore is not None:
+            log = await offLoop(loadStoredLog, site, pasteId)
+        if log is None:
+            try:
+                log = await fetchLogAsync(session, site, pasteId)
+            except PasteNotFound:
+                markMissing(site, pasteId)
+                return None, None
+        cacheLog(site, pasteId, log)
+    return log
+
+
+async def offLoop(func, *args):
+    """Calls func in the default executor. Used for functions that hash logs
+    or use logStore, either of which would stall the event loop for every
+    connection while it runs."""
+    return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+async def fetchLogAsync(session, site, pasteId):
+    """Like fetchLog(), but downloads the paste with session."""
+    stale, validators = None, None
+    if site in revalidatedSites:
+        stale, validators = await offLoop(staleLog, site, pasteId)
+        if validators is None:
+            validators = {}
+    try:
+        log = await downloadLogAsync(session, site, pasteId, validators)
+    except NotModified:
+        log = None
+    return await offLoop(storeLog, site, pasteId, revalidatedLog(stale, log), validators)
+
+
+async def downloadLogAsync(session, site, pasteId, validators=None):
+    """Like downloadLog(), but downloads the paste with session."""
+    try:
+        if site == 'gist':
+            return await getGistLogAsync(session, pasteId, validators)
+        if site == 'haste':
+            logLines = getLinesHaste(await getHasteAsync(session, pasteId))
+        elif site == 'obs':
+            logLines = getLinesObslog(await getObslogAsync(session, pasteId))
+        elif site == 'pastebin':
+            logLines = getLinesPaste(await getRawPasteAsync(session, pasteId, validators))
+        elif site == 'discord':
+            pasteObject = await getRawDiscordAsync(session, pasteId)
+            if len(pasteObject) == 0:
+                return None, None
+            logLines = getLinesDiscord(pasteObject)
+        else:
+            return None, None
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:  # connection failures and bad JSON
+        raise FetchError('{} paste {}: {}'.format(site, pasteId, e)) from e
+    return getDescription(logLines), logLines
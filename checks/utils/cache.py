@@ -0,0 +1,90 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread-safe LRU cache bounded by number of entries and total size.
+
+    Every entry is stored with its size, as computed by the caller, and the
+    number of seconds it stays valid. Expired entries count as misses, but
+    are kept until evicted so that getStale() can still return them; the
+    least recently used entries are evicted whenever either bound is
+    exceeded. Values larger than maxBytes are not stored at all.
+    """
+
+    def __init__(self, maxEntries=128, maxBytes=256 << 20, clock=time.monotonic):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (value, size, expiry)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns the value stored for key, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (entry[2] is not None and entry[2] <= self.clock()):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def getStale(self, key):
+        """Returns the value stored for key even if it expired, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key, value, size, ttl=None):
+        """Stores value for ttl seconds, or until evicted if ttl is None."""
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if size > self.maxBytes or self.maxEntries <= 0:
+                return
+            expiry = None if ttl is None else self.clock() + ttl
+            self.entries[key] = (value, size, expiry)
+            self.size += size
+            while len(self.entries) > self.maxEntries or self.size > self.maxBytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        value, size, expiry = self.entries.pop(key)
+        self.size -= size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+
+def sourceVersion(*paths):
+    """Returns a hash of the given files and of the .py and .mo files below
+    the given directories, which changes whenever the code or translations
+    they hold do."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = sorted(os.path.join(root, n) for root, dirs, names in os.walk(path)
+                           for n in names if n.endswith(('.py', '.mo')))
+        for name in files:
+            h.update(os.path.relpath(name, os.path.dirname(path)).encode('utf-8'))
+            with open(name, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import lzma
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+from .logbuffer import LogBuffer
+
+
+compressors = {
+    'zlib': ('.z', lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': ('.xz', lzma.compress, lzma.decompress),
+}
+
+
+class LogStore(object):
+    """Content-addressed store of downloaded logs on disk.
+
+    Logs are kept compressed under objects/, named after the hash of their
+    content (LogBuffer.digest()) and sharded into subdirectories by its first
+    two characters, so a log posted under several paste ids is stored once.
+    index/ maps every paste to the hash of its log, with its description,
+    the time it was downloaded and the headers it can be revalidated with,
+    in one small file per paste.
+
+    Every file is written to a temporary name and renamed into place, so
+    several processes on one host can share a store and readers never see a
+    partly written file. Objects are read back in whatever format they were
+    written in, whichever compression is configured now.
+
+    Once the objects exceed maxBytes the least recently read or stored ones
+    are removed until they take up lowWater of it, so that the store is not
+    scanned again on every write; pastes indexed to a removed object are
+    then misses.
+    """
+
+    lowWater = 0.9
+
+    def __init__(self, path, maxBytes=1 << 30, compression='zlib', clock=time.time):
+        if compression not in compressors:
+            raise ValueError('unknown compression: {}'.format(compression))
+        self.path = path
+        self.maxBytes = maxBytes
+        self.compression = compression
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.size = None  # bytes in objects/, as last counted by this process
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.removals = 0
+        for sub in ('objects', 'index'):
+            os.makedirs(os.path.join(path, sub), exist_ok=True)
+
+    def indexPath(self, site, pasteId):
+        name = hashlib.blake2b('{}/{}'.format(site, pasteId).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.path, 'index', name[:2], name + '.json')
+
+    def objectPath(self, digest, extension):
+        return os.path.join(self.path, 'objects', digest[:2], digest + extension)
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _touch(self, path):
+        """Marks an object as recently used for collect() and returns
+        whether it exists."""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def get(self, site, pasteId, ttl=None):
+        """Returns (description message, lines) stored for a paste, or None
+        if it is not stored or was downloaded more than ttl seconds ago."""
+        index = self.indexPath(site, pasteId)
+        try:
+            with open(index, 'rb') as f:
+                entry = json.loads(f.read().decode('utf-8'))
+            if ttl is not None and entry['stored'] + ttl <= self.clock():
+                raise LookupError
+            digest = entry['digest']
+        except (OSError, ValueError, LookupError, TypeError):
+            self.misses += 1
+            return None
+
+        logLines = self.load(digest)
+        if logLines is None:
+            self._remove(index)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['description'], logLines
+
+    def validators(self, site, pasteId):
+        """Returns (validators, digest) stored for a paste, the upstream
+        headers its log can be revalidated with and the hash of that log,
+        or None."""
+        try:
+            with open(self.indexPath(site, pasteId), 'rb') as f:
+                entry = json.loads(f.read().decode('utf-8'))
+            if entry.get('validators'):
+                return entry['validators'], entry['digest']
+        except (OSError, ValueError, LookupError, TypeError):
+            pass
+        return None
+
+    def load(self, digest):
+        """Returns the log stored under digest as a LogBuffer, or None."""
+        for extension, compress, decompress in compressors.values():
+            path = self.objectPath(digest, extension)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            try:
+                logLines = LogBuffer(decompress(data).decode('utf-8', 'surrogatepass'))
+            except (zlib.error, lzma.LZMAError, UnicodeDecodeError):
+                logLines = None
+            if logLines is None or logLines.digest() != digest:
+                self._remove(path)  # damaged
+                continue
+            self._touch(path)
+            return logLines
+        return None
+
+    def put(self, site, pasteId, description, logLines, validators=None):
+        """Stores the log of a paste, unless it is already stored, and
+        indexes the paste to it together with validators."""
+        digest = logLines.digest()
+        extension, compress, decompress = compressors[self.compression]
+        if not any(self._touch(self.objectPath(digest, e)) for e, c, d in compressors.values()):
+            if logLines.starts:
+                lower = logLines.starts[0]
+                data = logLines.data[lower:logLines.end]
+                data = data.encode('utf-8', 'surrogatepass') if logLines.isText else bytes(data)
+            else:
+                data = b''
+            data = compress(data)
+            self._write(self.objectPath(digest, extension), data)
+            self.writes += 1
+            with self.lock:
+                if self.size is not None:
+                    self.size += len(data)
+                collect = self.size is None or self.size > self.maxBytes
+            if collect:
+                self.collect()
+        entry = {'site': site, 'id': pasteId, 'digest': digest,
+                 'description': description, 'stored': self.clock(), 'validators': validators}
+        self._write(self.indexPath(site, pasteId), json.dumps(entry).encode('utf-8'))
+
+    def objects(self):
+        """Returns (mtime, size, path) of every stored object."""
+        found = []
+        root = os.path.join(self.path, 'objects')
+        for shard in os.listdir(root):
+            directory = os.path.join(root, shard)
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if name.startswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, st.st_size, path))
+        return found
+
+    def entries(self):
+        """Returns (mtime, path) of every index entry."""
+        found = []
+        root = os.path.join(self.path, 'index')
+        for shard in os.listdir(root):
+            directory = os.path.join(root, shard)
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if name.startswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    found.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue
+        return found
+
+    def collect(self):
+        """Removes the least recently used objects until they fit in
+        lowWater of maxBytes if they exceed it, and the index entries of
+        pastes whose object is gone."""
+        started = time.time()
+        found = self.objects()
+        size = sum(f[1] for f in found)
+        if size > self.maxBytes:
+            found.sort()
+            while found and size > self.maxBytes * self.lowWater:
+                mtime, objectSize, path = found.pop(0)
+                self._remove(path)
+                size -= objectSize
+                self.removals += 1
+        with self.lock:
+            self.size = size
+
+        kept = set(os.path.basename(path).split('.')[0] for mtime, objectSize, path in found)
+        for mtime, path in self.entries():
+            if mtime >= started:  # may index an object stored since the objects were listed
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    digest = json.loads(f.read().decode('utf-8'))['digest']
+            except (OSError, ValueError, LookupError, TypeError):
+                digest = None
+            if digest not in kept:
+                self._remove(path)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes,
+                    'removals': self.removals, 'bytes': self.size or 0}
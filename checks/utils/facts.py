@@ -0,0 +1,58 @@
+import functools
+
+from .logindex import LogIndex
+
+
+# fact name -> function deriving it from the log lines
+derivations = {}
+
+
+class LogFacts(object):
+    """Facts derived from one log, such as the Windows or OBS version.
+
+    Facts are computed lazily on first access and then cached on the
+    instance, so every check reading facts.windows_version shares a single
+    scan of the log. Functions become facts through the @fact decorator.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __getattr__(self, name):
+        try:
+            derive = derivations[name]
+        except KeyError:
+            raise AttributeError(name)
+        value = derive(self.lines)
+        setattr(self, name, value)
+        return value
+
+
+def getFacts(lines):
+    """Returns the facts store of a LogIndex, or a throwaway one for plain lists.
+
+    Region indexes share the facts of the whole log they were cut from.
+    """
+    if isinstance(lines, LogIndex):
+        while lines.parent is not None:
+            lines = lines.parent
+        if lines.facts is None:
+            lines.facts = LogFacts(lines)
+        return lines.facts
+    return LogFacts(lines)
+
+
+def fact(name):
+    """Registers the decorated function as the derivation of facts.<name>.
+
+    The decorated function keeps its signature, but calls with a LogIndex are
+    answered from that log's facts store instead of being recomputed.
+    """
+    def decorator(func):
+        derivations[name] = func
+
+        @functools.wraps(func)
+        def wrapper(lines):
+            return getattr(getFacts(lines), name)
+        return wrapper
+    return decorator
@@ -1,6 +1,142 @@
-import requests
+import codecs
+import json
+import mmap
+import os
 import re
 
+import requests
+
+from .cache import LRUCache
+from .diskstore import LogStore
+from .httpclient import getHttpClient
+from .logbuffer import LogBuffer
+
+
+class FetchError(Exception):
+    """A paste could not be downloaded."""
+
+
+class PasteNotFound(FetchError):
+    """The paste does not exist, or no longer does."""
+
+
+class PasteTooLarge(FetchError):
+    """The paste is larger than maxLogBytes."""
+
+
+class NotModified(Exception):
+    """The paste did not change since the validators of a conditional
+    download were stored."""
+
+
+def checkStatus(status, site, pasteId, missing=(404, 410)):
+    """Raises PasteNotFound if status is one of missing, or FetchError if it
+    is any other status than 200."""
+    if status in missing:
+        raise PasteNotFound('{} paste {}: HTTP {}'.format(site, pasteId, status))
+    if status != 200:
+        raise FetchError('{} paste {}: HTTP {}'.format(site, pasteId, status))
+
+
+# Bodies are read in chunks of chunkSize bytes, and downloads larger than
+# maxLogBytes are abandoned.
+chunkSize = 64 << 10
+maxLogBytes = 64 << 20
+
+
+class BodyReader(object):
+    """Decodes the body of a paste as UTF-8, chunk by chunk, raising
+    PasteTooLarge as soon as it exceeds maxLogBytes."""
+
+    def __init__(self, site, pasteId, length=None):
+        self.site = site
+        self.pasteId = pasteId
+        self.size = 0
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        if length is not None and int(length) > maxLogBytes:
+            self.tooLarge(length)
+
+    def tooLarge(self, size):
+        raise PasteTooLarge('{} paste {}: more than {} bytes ({})'.format(self.site, self.pasteId, maxLogBytes, size))
+
+    def decode(self, chunk, final=False):
+        self.size += len(chunk)
+        if self.size > maxLogBytes:
+            self.tooLarge(self.size)
+        return self.decoder.decode(chunk, final)
+
+
+def readText(resp, site, pasteId):
+    """Returns the body of a streamed requests response as text."""
+    reader = BodyReader(site, pasteId, resp.headers.get('Content-Length'))
+    parts = [reader.decode(chunk) for chunk in resp.iter_content(chunkSize)]
+    parts.append(reader.decode(b'', True))
+    return ''.join(parts)
+
+
+def splitLines(texts):
+    """Yields the lines of a log arriving as consecutive pieces of text, as
+    soon as each is complete. Like str.split('\n'), a trailing newline
+    yields an empty last line."""
+    partial = ''
+    for text in texts:
+        lines = (partial + text).split('\n')
+        partial = lines.pop()
+        yield from lines
+    yield partial
+
+
+def conditionalHeaders(validators):
+    """Returns the request headers making a download conditional on
+    validators, as kept by updateValidators()."""
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('lastModified'):
+            headers['If-Modified-Since'] = validators['lastModified']
+    return headers
+
+
+def updateValidators(validators, headers):
+    """Replaces validators with the ETag and Last-Modified response headers."""
+    if validators is not None:
+        validators.clear()
+        if headers.get('ETag'):
+            validators['etag'] = headers['ETag']
+        if headers.get('Last-Modified'):
+            validators['lastModified'] = headers['Last-Modified']
+
+
+def getText(url, site, pasteId, missing=(404, 410), validators=None):
+    """Downloads url in chunks and returns its body as text.
+
+    Given a validators dict, the download is conditional on it: NotModified
+    is raised if the body did not change, and otherwise the dict is updated
+    to the validators of the new body."""
+    headers = conditionalHeaders(validators)
+    with getHttpClient().get(url, stream=True, headers=headers) as resp:
+        if resp.status_code == 304 and headers:
+            raise NotModified(url)
+        checkStatus(resp.status_code, site, pasteId, missing)
+        updateValidators(validators, resp.headers)
+        return readText(resp, site, pasteId)
+
+
+def iterText(url, site, pasteId, missing=(404, 410)):
+    """Downloads url in chunks and yields its body as pieces of text while
+    they arrive, without keeping them. Raises FetchError, like
+    downloadLog(), if the connection fails."""
+    try:
+        with getHttpClient().get(url, stream=True) as resp:
+            checkStatus(resp.status_code, site, pasteId, missing)
+            reader = BodyReader(site, pasteId, resp.headers.get('Content-Length'))
+            for chunk in resp.iter_content(chunkSize):
+                yield reader.decode(chunk)
+            yield reader.decode(b'', True)
+    except requests.RequestException as e:
+        raise FetchError('{} paste {}: {}'.format(site, pasteId, e)) from e
+
 
 # gist.github.com
 # --------------------------------------
@@ -11,15 +147,51 @@ def matchGist(url):
         r"(?i)\b((?:https?:(?:/{1,3}gist\.github\.com)/)(anonymous/)?([a-z0-9]{32}))", url)
 
 
-def getGist(inputUrl):
+def getGist(inputUrl, validators=None):
     API_URL = "https://api.github.com"
     gistId = inputUrl
-    return requests.get('{0}/gists/{1}'.format(API_URL, gistId)).json()
+    return json.loads(getText('{0}/gists/{1}'.format(API_URL, gistId), 'gist', gistId, validators=validators))
 
 
-def getLinesGist(gistObject):
+def getGistFile(gistObject):
+    """Returns the API object of the first file of a gist. Its content is
+    cut off after about 1 MB, in which case truncated is set and the whole
+    file has to be downloaded from its raw_url."""
+    if not gistObject.get('files'):
+        raise PasteNotFound('gist {} has no files'.format(gistObject.get('id')))
     files = [(v, k) for (k, v) in gistObject['files'].items()]
-    return files[0][0]['content'].split('\n')
+    return files[0][0]
+
+
+def getLinesGist(gistObject):
+    return LogBuffer(getGistFile(gistObject)['content'])
+
+
+def getGistLog(gistId, validators=None):
+    """Returns (description message, lines) of a gist, downloading the file
+    itself from raw_url if the API truncated it."""
+    gistObject = getGist(gistId, validators)
+    gistFile = getGistFile(gistObject)
+    if gistFile.get('truncated'):
+        logLines = LogBuffer(getText(gistFile['raw_url'], 'gist', gistId))
+    else:
+        logLines = getLinesGist(gistObject)
+    return getDescriptionGist(gistObject), logLines
+
+
+def streamGist(gistId):
+    """Returns the description message of a gist and an iterator over its
+    lines, like streamLog()."""
+    try:
+        gistObject = getGist(gistId)
+        gistFile = getGistFile(gistObject)
+        if gistFile.get('truncated'):
+            lines = splitLines(iterText(gistFile['raw_url'], 'gist', gistId))
+        else:
+            lines = splitLines([gistFile['content']])
+        return getDescriptionGist(gistObject), lines
+    except (requests.RequestException, ValueError) as e:  # connection failures and bad JSON
+        raise FetchError('gist paste {}: {}'.format(gistId, e)) from e
 
 
 def getDescriptionGist(gistObject):
@@ -40,12 +212,13 @@ def matchHaste(url):
 
 def getHaste(hasteId):
     API_URL = "https://hastebin.com"
-    return requests.get('{0}/documents/{1}'.format(API_URL, hasteId)).json()
+    return json.loads(getText('{0}/documents/{1}'.format(API_URL, hasteId), 'haste', hasteId))
 
 
 def getLinesHaste(hasteObject):
-    text = hasteObject['data']
-    return text.split('\n')
+    if 'data' not in hasteObject:
+        raise PasteNotFound('haste {} has no data'.format(hasteObject.get('key')))
+    return LogBuffer(hasteObject['data'])
 
 
 def getDescription(lines):
@@ -62,12 +235,11 @@ def matchObs(url):
 
 
 def getObslog(obslogId):
-    API_URL = "https://obsproject.com/logs"
-    return requests.get('{0}/{1}'.format(API_URL, obslogId)).text
+    return getText(rawUrl('obs', obslogId), 'obs', obslogId)
 
 
 def getLinesObslog(obslogText):
-    return obslogText.split('\n')
+    return LogBuffer(obslogText)
 
 
 # pastebin.com
@@ -79,13 +251,12 @@ def matchPastebin(url):
         r"(?i)\b((?:https?:(?:/{1,3}(www\.)?pastebin\.com/))(?:raw/)?(.{8}))", url)
 
 
-def getRawPaste(obslogId):
-    API_URL = "https://pastebin.com/raw"
-    return requests.get('{0}/{1}'.format(API_URL, obslogId)).text
+def getRawPaste(obslogId, validators=None):
+    return getText(rawUrl('pastebin', obslogId), 'pastebin', obslogId, validators=validators)
 
 
 def getLinesPaste(obslogText):
-    return obslogText.split('\n')
+    return LogBuffer(obslogText)
 
 
 # discord
@@ -97,22 +268,291 @@ def matchDiscord(url):
         r"(?i)\b((?:https?:(?:/{1,3}cdn\.discordapp\.com)/)(attachments/)([0-9]{18,}/[0-9]{18,}/(?:[0-9\-\_]{19}|message).txt(?:\?\S+\&)?))", url)
 
 
+# expired or deleted attachments answer with 403 or 404
+discordMissing = (403, 404, 410)
+
+
 def getRawDiscord(obslogId):
-    API_URL = "https://cdn.discordapp.com/attachments"
-    resp = requests.get('{0}/{1}'.format(API_URL, obslogId))
-    if resp.status_code == 200:
-        return resp.text
-    return ""
+    return getText(rawUrl('discord', obslogId), 'discord', obslogId, discordMissing)
 
 
 def getLinesDiscord(obslogText):
-    return obslogText.split('\n')
+    return LogBuffer(obslogText)
+
+
+# any site
+# --------------------------------------
+
+
+def matchUrl(url):
+    """Returns (site, paste id) for the URL of a supported paste site, or
+    (None, None)."""
+    for site, match in (('gist', matchGist), ('haste', matchHaste), ('obs', matchObs),
+                        ('pastebin', matchPastebin), ('discord', matchDiscord)):
+        m = match(url)
+        if m:
+            pasteId = m.groups()[-1]
+            if site == 'discord' and pasteId == "message":
+                pasteId = m.groups()[-2]
+            return site, pasteId
+    return None, None
+
+
+# Sites serving the log itself, rather than JSON around it
+rawSites = {
+    'obs': "https://obsproject.com/logs",
+    'pastebin': "https://pastebin.com/raw",
+    'discord': "https://cdn.discordapp.com/attachments",
+}
+
+
+def rawUrl(site, pasteId):
+    return '{0}/{1}'.format(rawSites[site], pasteId)
+
+
+def streamLog(site, pasteId):
+    """Yields the lines of a paste on one of rawSites while it downloads,
+    without keeping them, so that analysing them overlaps with the download
+    and memory use does not grow with the log."""
+    missing = discordMissing if site == 'discord' else (404, 410)
+    return splitLines(iterText(rawUrl(site, pasteId), site, pasteId, missing))
+
+
+# Seconds a downloaded paste is reused for, per site. Logs uploaded to
+# obsproject.com never change; gists and pastes can be edited.
+pasteTtls = {
+    'obs': 7 * 24 * 3600,
+    'discord': 24 * 3600,
+    'haste': 3600,
+    'gist': 300,
+    'pastebin': 300,
+}
+
+# (site, paste id) -> (description message, lines)
+logCache = LRUCache()
+
+# Sites whose pastes can change. Once the copy kept of one expires, it is
+# revalidated with the ETag and Last-Modified headers it was served with,
+# instead of being downloaded again; GitHub does not count the 304s against
+# the API rate limit.
+revalidatedSites = ('gist', 'pastebin')
+
+# (site, paste id) -> (validators, digest of the log they were served with)
+validatorCache = LRUCache(maxEntries=4096)
+revalidationStats = {'notModified': 0, 'modified': 0}
+
+# (site, paste id) of pastes found missing, for missingTtl seconds
+missingCache = LRUCache(maxEntries=4096)
+missingTtl = 60
+
+
+def configureLogCache(maxEntries=None, maxBytes=None, ttls=None):
+    """Changes the bounds of the downloaded log cache and the TTLs of sites."""
+    if maxEntries is not None:
+        logCache.maxEntries = maxEntries
+    if maxBytes is not None:
+        logCache.maxBytes = maxBytes
+    if ttls:
+        pasteTtls.update(ttls)
+    logCache.clear()
+    missingCache.clear()
+    validatorCache.clear()
+
+
+# optional LogStore that downloaded logs are also kept in, across restarts
+logStore = None
+
+
+def configureLogStore(path, maxBytes=1 << 30, compression='zlib'):
+    """Keeps downloaded logs in a LogStore at path, or in none if path is
+    None, and returns it."""
+    global logStore
+    logStore = None if path is None else LogStore(path, maxBytes=maxBytes, compression=compression)
+    return logStore
+
+
+def pasteKey(site, pasteId):
+    """Returns the key a paste is cached under. Discord attachment URLs carry
+    signature parameters that change while the file stays the same."""
+    if site == 'discord':
+        pasteId = pasteId.split('?')[0]
+    return site, pasteId
+
+
+def cacheLog(site, pasteId, log):
+    """Stores the result of downloadLog() in logCache, unless it holds no
+    log, and returns it."""
+    description, logLines = log
+    if logLines is not None:
+        logCache.put(pasteKey(site, pasteId), log, logLines.nbytes, pasteTtls.get(site, 300))
+    return log
+
+
+def loadStoredLog(site, pasteId):
+    """Returns the log of a paste from logStore, or None."""
+    if logStore is None:
+        return None
+    return logStore.get(*pasteKey(site, pasteId), ttl=pasteTtls.get(site, 300))
+
+
+def storeLog(site, pasteId, log, validators=None):
+    """Writes the result of downloadLog() to logStore, unless it holds no
+    log, keeps the validators it was served with and returns it."""
+    description, logLines = log
+    if logLines is None:
+        return log
+    if validators:
+        validatorCache.put(pasteKey(site, pasteId), (dict(validators), logLines.digest()), 1)
+    if logStore is not None:
+        try:
+            logStore.put(*pasteKey(site, pasteId), description, logLines, validators or None)
+        except OSError:
+            pass  # the store is only an optimisation, a full disk must not fail the analysis
+    return log
+
+
+def staleLog(site, pasteId):
+    """Returns (log, validators) of the expired copy of a paste kept in
+    logCache or logStore, or (None, None) if there is none that can be
+    revalidated."""
+    key = pasteKey(site, pasteId)
+    found = validatorCache.get(key)
+    if found is None and logStore is not None:
+        found = logStore.validators(*key)
+    if found is None:
+        return None, None
+    validators, digest = found
+    log = logCache.getStale(key)
+    if (log is None or log[1].digest() != digest) and logStore is not None:
+        log = logStore.get(*key)
+    if log is None or log[1].digest() != digest:
+        return None, None
+    return log, dict(validators)
+
+
+def revalidatedLog(stale, log):
+    """Returns the log to use after a conditional download, which is log, or
+    stale if log is None because the paste did not change."""
+    if log is None:
+        revalidationStats['notModified'] += 1
+        return stale
+    if stale is not None:
+        revalidationStats['modified'] += 1
+    return log
+
+
+def isMissing(site, pasteId):
+    """Returns whether the paste was recently found missing."""
+    return missingCache.get(pasteKey(site, pasteId)) is not None
+
+
+def markMissing(site, pasteId):
+    missingCache.put(pasteKey(site, pasteId), True, 1, missingTtl)
+
+
+def getLog(site, pasteId):
+    """Returns (description message, lines) of a paste, downloading it unless
+    it is in logCache or logStore, or (None, None) if it holds no log or does
+    not exist. Raises FetchError if it could not be downloaded."""
+    if site is None or isMissing(site, pasteId):
+        return None, None
+    log = logCache.get(pasteKey(site, pasteId))
+    if log is None:
+        log = loadStoredLog(site, pasteId)
+        if log is None:
+            try:
+                log = fetchLog(site, pasteId)
+            except PasteNotFound:
+                markMissing(site, pasteId)
+                return None, None
+        cacheLog(site, pasteId, log)
+    return log
+
+
+def fetchLog(site, pasteId):
+    """Downloads a paste and writes it to logStore. An expired copy of a
+    paste on one of revalidatedSites is only downloaded again if it changed."""
+    stale, validators = None, None
+    if site in revalidatedSites:
+        stale, validators = staleLog(site, pasteId)
+        if validators is None:
+            validators = {}
+    try:
+        log = downloadLog(site, pasteId, validators)
+    except NotModified:
+        log = None
+    return storeLog(site, pasteId, revalidatedLog(stale, log), validators)
+
+
+def downloadLog(site, pasteId, validators=None):
+    """Downloads a paste and returns (description message, lines), or
+    (None, None) if it holds no log. Raises PasteNotFound if it does not
+    exist and FetchError if it could not be downloaded. validators makes the
+    download of gists and pastebin pastes conditional, see getText()."""
+    try:
+        if site == 'gist':
+            return getGistLog(pasteId, validators)
+        if site == 'haste':
+            logLines = getLinesHaste(getHaste(pasteId))
+        elif site == 'obs':
+            logLines = getLinesObslog(getObslog(pasteId))
+        elif site == 'pastebin':
+            logLines = getLinesPaste(getRawPaste(pasteId, validators))
+        elif site == 'discord':
+            pasteObject = getRawDiscord(pasteId)
+            if len(pasteObject) == 0:
+                return None, None
+            logLines = getLinesDiscord(pasteObject)
+        else:
+            return None, None
+    except (requests.RequestException, ValueError) as e:  # connection failures and bad JSON
+        raise FetchError('{} paste {}: {}'.format(site, pasteId, e)) from e
+    return getDescription(logLines), logLines
 
 
 # local file
 def getLinesLocal(filename):
+    """Maps the file into memory and returns its lines, or None if it cannot
+    be read. Checks search the mapped bytes directly and only the lines they
+    look at are decoded."""
     try:
-        with open(filename, "r") as f:
-            return f.readlines()
-    except:
+        with open(filename, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files cannot be mapped
+                data = b''
+        return LogBuffer(data)
+    except OSError:
         return
+
+
+class LogTail(object):
+    """Reads what has been appended to a local log file, like `tail -f`."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.offset = 0
+        self.partial = b''
+
+    def read(self):
+        """Returns the lines completed since the previous call, with their
+        newlines, or None if the file was truncated and is read again from
+        the start. A line still being written is held back until its newline
+        arrives."""
+        try:
+            with open(self.filename, "rb") as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    self.offset = 0
+                    self.partial = b''
+                    return None
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return []
+        self.offset += len(data)
+        data = self.partial + data
+        end = data.rfind(b'\n') + 1
+        self.partial = data[end:]
+        if not end:
+            return []
+        return [line + b'\n' for line in data[:end - 1].split(b'\n')]
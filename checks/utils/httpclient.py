@@ -0,0 +1,82 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpClient(object):
+    """Keep-alive HTTP client shared by the paste fetchers.
+
+    requests sessions are not safe to share between threads, so every thread
+    gets its own, but all of them are mounted on one HTTPAdapter whose
+    connection pools are. Requests to a host therefore reuse its open
+    connections instead of paying for a new TCP and TLS handshake each time.
+
+    poolConnections is the number of hosts to keep pools for, poolMaxsize
+    the number of idle connections kept per host. Every request gets the
+    connect and read timeouts unless it passes its own.
+    """
+
+    def __init__(self, poolConnections=10, poolMaxsize=10, connectTimeout=5, readTimeout=30):
+        self.timeout = (connectTimeout, readTimeout)
+        self.adapter = HTTPAdapter(pool_connections=poolConnections, pool_maxsize=poolMaxsize)
+        self.local = threading.local()
+
+    def session(self):
+        """Returns the session of the calling thread."""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            self.local.session = session
+        return session
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session().get(url, **kwargs)
+
+    def stats(self):
+        """Returns {host: {'requests', 'connections', 'reused'}} for every
+        host with a pool, where reused counts the requests that were sent
+        over an already open connection."""
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = '{}://{}:{}'.format(key.key_scheme, key.key_host, key.key_port)
+            entry = stats.setdefault(host, {'requests': 0, 'connections': 0, 'reused': 0})
+            entry['requests'] += pool.num_requests
+            entry['connections'] += pool.num_connections
+            entry['reused'] += max(pool.num_requests - pool.num_connections, 0)
+        return stats
+
+    def close(self):
+        self.adapter.close()
+
+
+_client = None
+_clientLock = threading.Lock()
+
+
+def getHttpClient():
+    """Returns the shared client, creating one with the defaults if
+    configureHttp() was not called."""
+    global _client
+    with _clientLock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def configureHttp(**options):
+    """Replaces the shared client with one built from options (see
+    HttpClient) and returns it. Meant to be called once at startup."""
+    global _client
+    with _clientLock:
+        old, _client = _client, HttpClient(**options)
+    if old is not None:
+        old.close()
+    return _client
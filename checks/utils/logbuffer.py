@@ -0,0 +1,130 @@
+import bisect
+import hashlib
+from array import array
+
+
+def scanLineStarts(data, start=0, end=None):
+    """Returns an array of the offsets at which the lines of data[start:end]
+    begin, splitting on newlines the same way str.split('\\n') does."""
+    if end is None:
+        end = len(data)
+    newline = '\n' if isinstance(data, str) else b'\n'
+    starts = array('I' if end < 2 ** 32 else 'Q', [start])
+    find = data.find
+    pos = find(newline, start, end)
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = find(newline, pos + 1, end)
+    return starts
+
+
+class LogBuffer(object):
+    """The lines of a log, stored as one buffer plus an array of line offsets.
+
+    data is either text or a bytes-like object such as bytes or an mmap.
+    Instead of one Python string per line, only the offset at which each
+    line begins is kept, and a line is only turned into a string when it is
+    accessed. Lines are split on newlines like str.split('\\n'), so a
+    trailing newline yields an empty last line; a carriage return ending a
+    line is left out of it, as reading the file with universal newlines
+    would. Lines of bytes buffers are decoded as UTF-8.
+
+    Slicing returns a LogBuffer sharing the same data, and find() searches
+    the covered part of the data directly.
+    """
+
+    def __init__(self, data, starts=None, end=None, encoding='utf-8'):
+        self.data = data
+        self.end = len(data) if end is None else end
+        self.starts = scanLineStarts(data, 0, self.end) if starts is None else starts
+        self.encoding = encoding
+        self.isText = isinstance(data, str)
+        self.carriageReturn = '\r' if self.isText else b'\r'
+
+    @classmethod
+    def fromLines(cls, lines):
+        """Joins a list of lines, with or without their newlines."""
+        lines = [s[:-1] if s.endswith('\n') else s for s in lines]
+        if not lines:
+            return cls('', array('I'), 0)
+        return cls('\n'.join(lines))
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the lines covered by this buffer."""
+        if not self.starts:
+            return 0
+        return self.end - self.starts[0] + self.starts.itemsize * len(self.starts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lineEnd(self, i):
+        """Returns the offset just past the end of line i, newline and a
+        carriage return before it excluded."""
+        end = self.starts[i + 1] - 1 if i + 1 < len(self.starts) else self.end
+        if end > self.starts[i] and self.data[end - 1:end] == self.carriageReturn:
+            end -= 1
+        return end
+
+    def line(self, i):
+        value = self.data[self.starts[i]:self.lineEnd(i)]
+        if self.isText:
+            return value
+        return bytes(value).decode(self.encoding, 'replace')
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            lower, higher, step = key.indices(len(self.starts))
+            if step != 1:
+                return [self.line(i) for i in range(lower, higher, step)]
+            if higher <= lower:
+                end = self.starts[lower] if lower < len(self.starts) else self.end
+                return LogBuffer(self.data, array(self.starts.typecode), end, self.encoding)
+            return LogBuffer(self.data, self.starts[lower:higher], self.lineEnd(higher - 1), self.encoding)
+        if key < 0:
+            key += len(self.starts)
+        if key < 0 or key >= len(self.starts):
+            raise IndexError('line index out of range')
+        return self.line(key)
+
+    def __iter__(self):
+        for i in range(len(self.starts)):
+            yield self.line(i)
+
+    def encode(self, term):
+        if self.isText or not isinstance(term, str):
+            return term
+        return term.encode(self.encoding)
+
+    def find(self, term, start=None):
+        """Returns the offset of the next occurrence of term in the covered
+        part of the data, or -1."""
+        if not self.starts:
+            return -1
+        if start is None or start < self.starts[0]:
+            start = self.starts[0]
+        return self.data.find(self.encode(term), start, self.end)
+
+    def digest(self):
+        """Returns a hash of the covered lines. Logs with the same content
+        hash the same whether they are stored as text or as UTF-8 bytes."""
+        h = hashlib.blake2b(digest_size=16)
+        if self.starts:
+            lower = self.starts[0]
+            if self.isText:
+                h.update(self.data[lower:self.end].encode('utf-8', 'surrogatepass'))
+            else:
+                with memoryview(self.data) as view:
+                    h.update(view[lower:self.end])
+        return h.hexdigest()
+
+    def close(self):
+        """Unmaps the data if it is a memory map. The buffer and its slices
+        must not be used afterwards."""
+        if hasattr(self.data, 'close'):
+            self.data.close()
+
+    def lineNumberAt(self, pos):
+        """Returns the number of the line containing data offset pos."""
+        return bisect.bisect_right(self.starts, pos) - 1
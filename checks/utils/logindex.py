@@ -0,0 +1,178 @@
+from .logbuffer import LogBuffer
+
+
+sectionDivider = '------------------------------------------------'
+subSectionDivider = '---------------------------------'
+
+# output sessions, as (start marker, stop marker)
+sessionMarkers = (
+    ('== Recording Start ==', '== Recording Stop =='),
+    ('== Streaming Start ==', '== Streaming Stop =='),
+    ('== Replay Buffer Start ==', '== Replay Buffer Stop =='),
+)
+
+regionNames = ('header', 'modules', 'scenes')
+
+
+class LogIndex(object):
+    """Line index over a single log, built once per analysis.
+
+    The lines are kept in a LogBuffer, one contiguous buffer plus the offset
+    of every line; a list of lines is joined into one when the index is
+    built. Term lookups are answered with a find over that buffer instead of
+    a Python-level loop over every line, and the resulting posting lists
+    (sorted line numbers containing the term) are cached, so checks that
+    search for the same anchor text share a single lookup.
+
+    The index behaves like the list of lines it was built from, so checks
+    can keep indexing and slicing it directly. Slices are LogBuffers sharing
+    the same data.
+
+    region() and sessions() return indexes over parts of the log, so that
+    checks interested in e.g. the system info header only search that part.
+    Region indexes keep a reference to the index they were cut from in
+    `parent` and share its facts.
+    """
+
+    def __init__(self, lines, parent=None):
+        if not isinstance(lines, LogBuffer):
+            lines = LogBuffer.fromLines(lines)
+        self.lines = lines
+        self.postings = {}
+        self.facts = None
+        self.parent = parent
+        self.regionCache = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, key):
+        return self.lines[key]
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def _find(self, term, pos):
+        """Returns (position, line number) of the next match of term at or
+        after pos that lies within a single line, or (-1, None)."""
+        buffer = self.lines
+        length = len(buffer.encode(term))
+        pos = buffer.find(term, pos)
+        while pos != -1:
+            i = buffer.lineNumberAt(pos)
+            if pos + length <= buffer.lineEnd(i):
+                return pos, i
+            pos = buffer.find(term, pos + 1)
+        return -1, None
+
+    def lineNumbers(self, term):
+        """Returns the sorted numbers of the lines containing term."""
+        try:
+            return self.postings[term]
+        except KeyError:
+            pass
+
+        if not term:
+            found = list(range(len(self.lines)))
+        else:
+            found = []
+            pos, i = self._find(term, 0)
+            while i is not None:
+                found.append(i)
+                pos, i = self._find(term, self.lines.lineEnd(i) + 1)
+
+        self.postings[term] = found
+        return found
+
+    def firstLineNumber(self, term):
+        """Returns the number of the first line containing term, or None.
+
+        Unlike lineNumbers() this stops at the first match, so looking up
+        anchors near the start of a huge log is cheap.
+        """
+        if term in self.postings:
+            found = self.postings[term]
+            return found[0] if found else None
+        if not term:
+            return 0 if len(self.lines) else None
+        return self._find(term, 0)[1]
+
+    def prime(self, matcher):
+        """Fills the posting lists of every matcher term in a single sweep."""
+        self.postings.update(matcher.scan(self.lines))
+
+    def contains(self, term):
+        return self.firstLineNumber(term) is not None
+
+    def search(self, term):
+        line = self.lines.line
+        return [line(i) for i in self.lineNumbers(term)]
+
+    def searchExclude(self, term, exclude):
+        return [s for s in self.search(term) if not any(excludeTerm in s for excludeTerm in exclude)]
+
+    def searchWithIndex(self, term):
+        line = self.lines.line
+        return [[line(i), i] for i in self.lineNumbers(term)]
+
+    def view(self, lower, higher):
+        """Returns an index over lines[lower:higher] that shares our facts."""
+        return LogIndex(self.lines[lower:higher], parent=self)
+
+    def regionBounds(self, name):
+        """Returns (lower, higher) line numbers of a region of the log.
+
+        header:  the system info before the first divider, or the whole log
+                 if it has none
+        modules: the 'Loaded Modules:' list up to the divider closing it
+        scenes:  the scene dump, from the first '- scene' line to the next
+                 section divider
+        Missing regions are empty.
+        """
+        if name == 'header':
+            end = self.firstLineNumber(subSectionDivider)
+            return 0, len(self) if end is None else end
+
+        if name == 'modules':
+            start = self.firstLineNumber('Loaded Modules:')
+            if start is None:
+                return 0, 0
+            end = next((i for i in self.lineNumbers(subSectionDivider) if i > start), len(self))
+            return start, end
+
+        if name == 'scenes':
+            scenes = self.lineNumbers('- scene')
+            if not scenes:
+                return 0, 0
+            end = next((i for i in self.lineNumbers(sectionDivider) if i > scenes[-1]), len(self))
+            return scenes[0], end
+
+        raise ValueError("Unknown log region '{}'".format(name))
+
+    def region(self, name):
+        """Returns an index over one of the regions in regionNames."""
+        try:
+            return self.regionCache[name]
+        except KeyError:
+            pass
+        view = self.view(*self.regionBounds(name))
+        self.regionCache[name] = view
+        return view
+
+    def sessionBounds(self):
+        """Returns (lower, higher) line numbers of every output session.
+
+        A session runs from its start marker up to and including the
+        matching stop marker, or to the end of the log if it never stopped.
+        """
+        bounds = []
+        for startMarker, stopMarker in sessionMarkers:
+            stops = self.lineNumbers(stopMarker)
+            for start in self.lineNumbers(startMarker):
+                end = next((i + 1 for i in stops if i > start), len(self))
+                bounds.append((start, end))
+        return sorted(bounds)
+
+    def sessions(self):
+        """Returns an index over every output session, in log order."""
+        return [self.view(lower, higher) for lower, higher in self.sessionBounds()]
@@ -0,0 +1,153 @@
+import bisect
+from collections import deque
+
+from .logbuffer import scanLineStarts
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# Terms the checks search for. Every checks module registers its literal
+# search strings at import time, so a single matcher can look for all of them
+# in one sweep over the log.
+registeredTerms = set()
+_matcher = None
+
+
+def registerTerms(*terms):
+    global _matcher
+    new = set(t for t in terms if t) - registeredTerms
+    if new:
+        registeredTerms.update(new)
+        _matcher = None
+
+
+def getTermMatcher():
+    """Returns the matcher compiled from every registered term."""
+    global _matcher
+    if _matcher is None:
+        _matcher = TermMatcher(registeredTerms)
+    return _matcher
+
+
+class TermMatcher(object):
+    """Aho-Corasick matcher for a fixed set of literal terms.
+
+    scan() finds every term in a single linear sweep of the log instead of
+    one pass per term. The C automaton from pyahocorasick is used when it is
+    installed; otherwise an equivalent pure-Python automaton is built. The
+    pure-Python sweep is correct but slower than per-term str.find over a
+    joined buffer, so callers should check `accelerated` before preferring it.
+    Passing accelerated=False forces the pure-Python automaton.
+    """
+
+    # characters handed to the C automaton at once
+    chunkSize = 1 << 20
+
+    def __init__(self, terms, accelerated=None):
+        self.terms = sorted(set(t for t in terms if t))
+        if accelerated is None:
+            accelerated = ahocorasick is not None
+        self.accelerated = accelerated
+        if self.accelerated:
+            self._automaton = ahocorasick.Automaton()
+            for term in self.terms:
+                self._automaton.add_word(term, (term, len(term)))
+            if self.terms:
+                self._automaton.make_automaton()
+        else:
+            self._buildAutomaton()
+
+    def _buildAutomaton(self):
+        # trie
+        delta = [{}]
+        output = [()]
+        for term in self.terms:
+            state = 0
+            for ch in term:
+                nxt = delta[state].get(ch)
+                if nxt is None:
+                    nxt = len(delta)
+                    delta.append({})
+                    output.append(())
+                    delta[state][ch] = nxt
+                state = nxt
+            output[state] += (term,)
+
+        # failure links, visited breadth-first so that the fail state of
+        # every node is complete before the node itself is
+        fail = [0] * len(delta)
+        order = []
+        queue = deque(delta[0].values())
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for ch, nxt in delta[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in delta[f]:
+                    f = fail[f]
+                target = delta[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                output[nxt] += output[fail[nxt]]
+
+        # fold the failure links into the transition tables so that the
+        # sweep never has to follow them
+        for state in order:
+            for ch, nxt in delta[fail[state]].items():
+                delta[state].setdefault(ch, nxt)
+
+        self._delta = delta
+        self._output = output
+
+    def scan(self, buffer):
+        """Returns {term: sorted line numbers} for every term found in the
+        lines of a LogBuffer. Terms that do not occur map to an empty list.
+        """
+        found = {term: [] for term in self.terms}
+        if not self.terms or not len(buffer):
+            return found
+
+        if self.accelerated:
+            # pyahocorasick copies the text it is given into a wide-character
+            # buffer, so feed it line-aligned chunks to bound that copy. The
+            # chunks of bytes buffers are decoded first, and matches located
+            # by the line starts of the decoded chunk.
+            last = {}
+            count = len(buffer)
+            lower = 0
+            while lower < count:
+                higher = min(buffer.lineNumberAt(buffer.starts[lower] + self.chunkSize) + 1, count)
+                offset = buffer.starts[lower]
+                chunk = buffer.data[offset:buffer.lineEnd(higher - 1)]
+                if buffer.isText:
+                    first, starts = 0, buffer.starts
+                else:
+                    chunk = bytes(chunk).decode(buffer.encoding, 'replace')
+                    first, offset, starts = lower, 0, scanLineStarts(chunk)
+                for end, (term, length) in self._automaton.iter(chunk):
+                    i = first + bisect.bisect_right(starts, offset + end - length + 1) - 1
+                    if last.get(term) != i:
+                        found[term].append(i)
+                        last[term] = i
+                lower = higher
+            return found
+
+        delta = self._delta
+        output = self._output
+        root = delta[0]
+        for i, line in enumerate(buffer):
+            state = 0
+            hits = None
+            for ch in line:
+                state = delta[state].get(ch, 0) if state else root.get(ch, 0)
+                if output[state]:
+                    if hits is None:
+                        hits = set()
+                    hits.update(output[state])
+            if hits:
+                for term in hits:
+                    found[term].append(i)
+        return found
@@ -0,0 +1,117 @@
+import os
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from .logbuffer import LogBuffer, scanLineStarts
+from .logindex import LogIndex
+from .matcher import TermMatcher, getTermMatcher
+
+
+class SharedLog(object):
+    """A copy of a LogBuffer in shared memory, for other processes to scan.
+
+    The segment holds the log as UTF-8 followed by the array of line starts,
+    so workers attach to it by name instead of each receiving a pickled
+    copy of the log. The creating process must close() it, which also
+    removes the segment.
+
+    Attaching to a segment registers it with the resource tracker, which
+    removes it when the process exits. Worker processes therefore have to
+    share the tracker of the creating process: pools must start their
+    workers after it runs, which the first SharedLog ensures, or be created
+    with ensureTracker() called beforehand.
+    """
+
+    def __init__(self, buffer):
+        if len(buffer):
+            lower = buffer.starts[0]
+            data = buffer.data[lower:buffer.end]
+        else:
+            lower, data = 0, b''
+        if buffer.isText:
+            data = data.encode('utf-8')
+            starts = scanLineStarts(data) if len(buffer) else array('I')
+        elif lower:
+            starts = array(buffer.starts.typecode, (s - lower for s in buffer.starts))
+        else:
+            starts = buffer.starts
+        self.size = len(data)
+        self.count = len(starts)
+        self.typecode = starts.typecode
+        startsBytes = starts.tobytes()
+        self.shm = shared_memory.SharedMemory(create=True, size=max(self.size + len(startsBytes), 1))
+        self.shm.buf[:self.size] = data
+        self.shm.buf[self.size:self.size + len(startsBytes)] = startsBytes
+        self.name = self.shm.name
+
+    def task(self):
+        """Returns what a worker needs to attach to the log."""
+        return self.name, self.size, self.count, self.typecode
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def ensureTracker():
+    """Starts the resource tracker now, so that processes forked from here
+    on share it with this one."""
+    resource_tracker.ensure_running()
+
+
+# matchers compiled in this worker process, by their terms
+_matchers = {}
+
+
+def _scanShared(task, lower, higher, terms):
+    """Returns the posting lists of terms for lines lower:higher of a
+    SharedLog, numbered from lower. Runs in a worker process."""
+    name, size, count, typecode = task
+    shm = shared_memory.SharedMemory(name)
+    try:
+        starts = array(typecode)
+        starts.frombytes(shm.buf[size:size + count * starts.itemsize])
+        end = starts[higher] - 1 if higher < count else size
+        text = bytes(shm.buf[starts[lower]:end]).decode('utf-8', 'replace')
+    finally:
+        shm.close()
+
+    try:
+        matcher = _matchers[terms]
+    except KeyError:
+        matcher = _matchers[terms] = TermMatcher(terms)
+    index = LogIndex(LogBuffer(text))
+    if matcher.accelerated:
+        index.prime(matcher)
+    return {t: index.lineNumbers(t) for t in terms}
+
+
+def primeParallel(index, executor, terms=None, batches=None):
+    """Fills the posting lists of a LogIndex using the processes of executor.
+
+    Each worker scans one range of lines of a SharedLog for every term (the
+    registered ones by default), and the results are merged into the
+    postings of the index. Terms never span lines, so this finds the same
+    lines a single sweep would. The log is cut into batches ranges, twice
+    the number of CPUs by default.
+    """
+    terms = tuple(sorted(getTermMatcher().terms if terms is None else terms))
+    if batches is None:
+        batches = 2 * (os.cpu_count() or 1)
+    count = len(index)
+    step = max(-(-count // batches), 1)
+    ranges = [(lower, min(lower + step, count)) for lower in range(0, count, step)]
+
+    found = {t: [] for t in terms}
+    with SharedLog(index.lines) as shared:
+        futures = [executor.submit(_scanShared, shared.task(), lower, higher, terms) for lower, higher in ranges]
+        for (lower, higher), future in zip(ranges, futures):
+            for t, numbers in future.result().items():
+                found[t].extend(i + lower for i in numbers)
+    index.postings.update(found)
@@ -0,0 +1,107 @@
+from .logindex import LogIndex, regionNames
+from .matcher import registerTerms
+
+
+# Anchor lines that only appear in the system info of logs from a platform.
+# A check declared for a platform is skipped unless one of them is present.
+platformTerms = {
+    'windows': ('Windows Version:',),
+    'mac': ('OS Name: Mac OS X', 'OS Name: macOS'),
+    'linux': ('Distribution:', 'Flatpak Runtime:'),
+}
+
+for terms in platformTerms.values():
+    registerTerms(*terms)
+
+
+# every check, in the order its messages are reported
+registeredChecks = []
+
+
+class Check(object):
+    """A registered check and the preconditions that must hold for it to run.
+
+    triggers are terms that must all appear in the log, platform names one of
+    platformTerms. region names the part of the log (see LogIndex.region())
+    the check is given instead of the whole log; triggers are looked up in
+    that region only. multiple marks checks that return a list of messages
+    rather than a single message. consumer is an optional stream.Consumer
+    class computing the same result incrementally, used when the log is
+    analysed as a stream.
+    """
+
+    def __init__(self, func, triggers=(), platform=None, region=None, multiple=False, consumer=None):
+        if platform is not None and platform not in platformTerms:
+            raise ValueError("Unknown platform '{}'".format(platform))
+        if region is not None and region not in regionNames:
+            raise ValueError("Unknown log region '{}'".format(region))
+        if region is not None and consumer is not None:
+            raise ValueError("Consumers are fed the whole log, not the '{}' region".format(region))
+        self.func = func
+        self.name = func.__name__
+        self.triggers = tuple(triggers)
+        self.platform = platform
+        self.region = region
+        self.multiple = multiple
+        self.consumer = consumer
+
+    def target(self, index):
+        """Returns the part of the log the check runs on."""
+        if self.region is None:
+            return index
+        return index.region(self.region)
+
+    def applies(self, index):
+        target = self.target(index)
+        if not all(target.contains(t) for t in self.triggers):
+            return False
+        if self.platform is not None:
+            return any(index.contains(t) for t in platformTerms[self.platform])
+        return True
+
+    def run(self, lines):
+        """Runs the check and returns its messages as a list."""
+        return self.messages(self.func(lines))
+
+    def messages(self, result):
+        """Returns what the check returned as a list of messages."""
+        if self.multiple:
+            return [m for m in (result or []) if m is not None]
+        if result is None:
+            return []
+        return [result]
+
+
+def check(triggers=(), platform=None, region=None, multiple=False, consumer=None):
+    """Registers the decorated function as a check run by runChecks().
+
+    The check is only invoked when all of its trigger terms occur in the log
+    and, if a platform is given, the log comes from that platform. Only
+    declare triggers the check already requires: it must return nothing when
+    one of them is missing. Likewise, only declare a region if everything
+    the check searches for lives in it.
+    """
+    def decorator(func):
+        registeredChecks.append(Check(func, triggers, platform, region, multiple, consumer))
+        registerTerms(*triggers)
+        if consumer is not None:
+            registerTerms(*consumer.terms)
+        return func
+    return decorator
+
+
+def orderChecks(funcs):
+    """Sorts registeredChecks into the order of the check functions given;
+    checks not given keep their registration order after them."""
+    position = {func: i for i, func in enumerate(funcs)}
+    registeredChecks.sort(key=lambda c: position.get(c.func, len(position)))
+
+
+def runChecks(lines, checks=None):
+    """Runs every applicable check and returns their messages in order."""
+    index = lines if isinstance(lines, LogIndex) else LogIndex(lines)
+    messages = []
+    for c in (registeredChecks if checks is None else checks):
+        if c.applies(index):
+            messages.extend(c.run(c.target(index)))
+    return messages
@@ -0,0 +1,235 @@
+import io
+
+from .logbuffer import LogBuffer
+from .logindex import LogIndex
+from .matcher import getTermMatcher
+from .registry import registeredChecks, platformTerms
+
+
+class Consumer(object):
+    """Incremental form of a check, fed the lines of a log one at a time.
+
+    feed() is called with every line in log order, and finish() returns what
+    the check would have returned for the whole log. terms lists the text a
+    line has to contain to matter to the consumer, and context how many of
+    the lines following such a line it also needs to see. Consumers must
+    ignore every other line, so that consumeLines() can skip them.
+    """
+
+    terms = ()
+    context = 0
+
+    def feed(self, line):
+        pass
+
+    def finish(self):
+        return None
+
+
+def consumeLines(consumer, lines):
+    """Feeds a log to consumer and returns its result.
+
+    Given a LogIndex, only the lines containing one of the consumer's terms
+    (and their context) are fed, so running a check through its consumer
+    costs no more than searching for those terms.
+    """
+    if isinstance(lines, LogIndex):
+        wanted = set()
+        for term in consumer.terms:
+            for i in lines.lineNumbers(term):
+                wanted.update(range(i, i + consumer.context + 1))
+        line = lines.lines.line
+        count = len(lines)
+        for i in sorted(wanted):
+            if i < count:
+                consumer.feed(line(i))
+    else:
+        for line in lines:
+            consumer.feed(line)
+    return consumer.finish()
+
+
+def parsePercentage(line):
+    """Returns the percentage in parentheses on a line such as
+    'Number of skipped frames due to encoding lag: 12/300 (4.0%)', or 0."""
+    try:
+        return float(line[line.find("(") + 1: line.find(")")].strip('%').replace(",", "."))
+    except (ValueError, OverflowError):
+        return 0
+
+
+class MaxPercentConsumer(Consumer):
+    """Tracks the highest percentage reported on the lines containing one of
+    terms, skipping those containing one of exclude."""
+
+    exclude = ()
+
+    def __init__(self):
+        self.val = 0
+
+    def feed(self, line):
+        if any(t in line for t in self.terms) and not any(e in line for e in self.exclude):
+            v = parsePercentage(line)
+            if (v > self.val):
+                self.val = v
+
+    def finish(self):
+        return self.val
+
+
+class StreamAnalysis(object):
+    """Runs checks over a log that is fed to it one line at a time.
+
+    Every line is pushed through the consumers of the checks registered with
+    one as it arrives, so those only keep their own running state. The lines
+    are kept for the remaining checks, in one growing buffer that close()
+    turns into a LogIndex; when every check has a consumer nothing is kept
+    and memory use does not grow with the log.
+
+    Lines may be text or bytes, with or without their trailing newline, and
+    are split the same way LogBuffer splits a whole log.
+
+    A log that is still being written can be analysed repeatedly with
+    results() while lines keep being fed. Consumers are never re-fed, and
+    the other checks are only run again once lines containing one of the
+    registered terms have arrived, since those are what the checks key on.
+    Consumers must therefore allow finish() to be called more than once.
+    """
+
+    def __init__(self, checks=None):
+        self.checks = list(registeredChecks if checks is None else checks)
+        self.consumers = {}
+        terms = set()
+        for c in self.checks:
+            if c.consumer is not None:
+                self.consumers[c.name] = c.consumer()
+                terms.update(c.triggers)
+                terms.update(platformTerms.get(c.platform, ()))
+        # trigger and platform terms of the consumers, until first seen
+        self.unseen = sorted(terms)
+        self.seen = set()
+        if all(c.consumer is not None for c in self.checks):
+            self.buffer = None
+        else:
+            self.buffer = io.StringIO()
+        self.count = 0
+        self.newline = False
+        self.closed = False
+        self.index = None
+        # lines fed since the last snapshot(), once there was one
+        self.fresh = None
+        self.resultsIndex = None
+        self.checkMessages = {}
+        self.incomplete = False
+
+    def feed(self, line):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'replace')
+        self.newline = line.endswith('\n')
+        if self.newline:
+            line = line[:-1]
+        if line.endswith('\r'):  # like LogBuffer, leave out the carriage return of CRLF line ends
+            line = line[:-1]
+
+        if self.unseen:
+            found = [t for t in self.unseen if t in line]
+            if found:
+                self.seen.update(found)
+                self.unseen = [t for t in self.unseen if t not in self.seen]
+        for consumer in self.consumers.values():
+            consumer.feed(line)
+
+        if self.buffer is not None:
+            if self.count:
+                self.buffer.write('\n')
+            self.buffer.write(line)
+            if self.fresh is not None:
+                self.fresh.append(line)
+        self.count += 1
+
+    def close(self):
+        """Ends the input and returns the index of the kept lines, or None if
+        no check needed them."""
+        if self.closed:
+            return self.index
+        # like str.split('\n'), a trailing newline (or no input at all)
+        # leaves an empty last line
+        if self.newline or not self.count:
+            self.newline = False
+            self.feed('')
+        self.closed = True
+
+        if self.buffer is not None:
+            self.index = self._buildIndex(self.buffer.getvalue())
+            self.buffer = None
+            self.fresh = None
+        return self.index
+
+    def _buildIndex(self, text):
+        index = LogIndex(LogBuffer(text))
+        matcher = getTermMatcher()
+        if matcher.accelerated:
+            index.prime(matcher)
+        return index
+
+    def snapshot(self):
+        """Returns an index of the lines fed so far, without ending the input.
+
+        The index is only rebuilt if the lines fed since the previous
+        snapshot contain a registered term, or a check could not handle the
+        previous one; otherwise the previous index is returned again.
+        """
+        if self.closed or self.buffer is None:
+            return self.index
+        if self.index is None or self.fresh:
+            matcher = getTermMatcher()
+            if self.index is None or self.incomplete or any(matcher.scan(LogBuffer.fromLines(self.fresh)).values()):
+                # mirror close(): a trailing newline leaves an empty last line
+                text = self.buffer.getvalue()
+                if self.newline:
+                    text += '\n'
+                self.index = self._buildIndex(text)
+        self.fresh = []
+        return self.index
+
+    def applies(self, c):
+        if not all(t in self.seen for t in c.triggers):
+            return False
+        if c.platform is not None:
+            return any(t in self.seen for t in platformTerms[c.platform])
+        return True
+
+    def results(self):
+        """Returns the messages of every applicable check for the lines fed
+        so far, in order."""
+        index = self.snapshot()
+        if index is not self.resultsIndex:
+            self.resultsIndex = index
+            self.checkMessages = {}
+            self.incomplete = False
+            for c in self.checks:
+                if c.consumer is None and c.applies(index):
+                    try:
+                        self.checkMessages[c.name] = c.run(c.target(index))
+                    except Exception:
+                        # checks expect a complete log and may fail on one
+                        # cut off in the middle of a block; they are run
+                        # again once more of it has arrived
+                        if self.closed:
+                            raise
+                        self.incomplete = True
+
+        messages = []
+        for c in self.checks:
+            consumer = self.consumers.get(c.name)
+            if consumer is None:
+                messages.extend(self.checkMessages.get(c.name, ()))
+            elif self.applies(c):
+                messages.extend(c.messages(consumer.finish()))
+        return messages
+
+    def finish(self):
+        """Ends the input and returns the messages of every applicable
+        check, in order."""
+        self.close()
+        return self.results()
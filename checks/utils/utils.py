@@ -1,33 +1,66 @@
+from .logbuffer import LogBuffer
+from .logindex import LogIndex, sectionDivider, subSectionDivider, sessionMarkers
+from .matcher import registerTerms, getTermMatcher
+from .facts import LogFacts, fact, getFacts
+from .registry import check, orderChecks, runChecks, registeredChecks
+from .parallel import primeParallel
+from .stream import Consumer, MaxPercentConsumer, StreamAnalysis, consumeLines, parsePercentage
+
+
+registerTerms(
+    sectionDivider,
+    subSectionDivider,
+    '- scene',
+    'Loaded Modules:',
+    *(marker for markers in sessionMarkers for marker in markers)
+)
+
+
 # other functions
 # --------------------------------------
 
 
+def asIndex(lines):
+    """Returns lines as a LogIndex if they are backed by a LogBuffer."""
+    if isinstance(lines, LogBuffer):
+        return LogIndex(lines)
+    return lines
+
+
 def search(term, lines):
+    lines = asIndex(lines)
+    if isinstance(lines, LogIndex):
+        return lines.search(term)
     return [s for s in lines if term in s]
 
 
 def searchExclude(term, lines, exclude):
+    lines = asIndex(lines)
+    if isinstance(lines, LogIndex):
+        return lines.searchExclude(term, exclude)
     return [s for s in lines if term in s and not any(excludeTerm in s for excludeTerm in exclude)]
 
 
 def searchWithIndex(term, lines):
+    lines = asIndex(lines)
+    if isinstance(lines, LogIndex):
+        return lines.searchWithIndex(term)
     return [[s, i] for i, s in enumerate(lines) if term in s]
 
 
+def searchPositions(term, lines):
+    lines = asIndex(lines)
+    if isinstance(lines, LogIndex):
+        return list(lines.lineNumbers(term))
+    return [i for i, s in enumerate(lines) if term in s]
+
+
 def getSections(lines):
-    sectPos = []
-    for i, s in enumerate(lines):
-        if '------------------------------------------------' in s:
-            sectPos.append(i)
-    return sectPos
+    return searchPositions(sectionDivider, lines)
 
 
 def getSubSections(lines):
-    sectPos = []
-    for i, s in enumerate(lines):
-        if '---------------------------------' in s:
-            sectPos.append(i)
-    return sectPos
+    return searchPositions(subSectionDivider, lines)
 
 
 def getNextPos(old, lst):
@@ -37,24 +70,16 @@ def getNextPos(old, lst):
 
 
 def getScenes(lines):
-    scenePos = []
-    for i, s in enumerate(lines):
-        if '- scene' in s:
-            scenePos.append(i)
-    return scenePos
+    return searchPositions('- scene', lines)
 
 
 def getLoadedModules(lines):
-    loadedModulePos = []
-    for i, s in enumerate(lines):
-        if 'Loaded Modules:' in s:
-            loadedModulePos.append(i)
-    return loadedModulePos
+    return searchPositions('Loaded Modules:', lines)
 
 
 def getPluginEnd(lines):
     loadedModules = getLoadedModules(lines)
     subSections = getSubSections(lines)
-    for i, s in enumerate(lines):
-        if (subSections[i] > loadedModules[0]):
-            return subSections[i]
+    for pos in subSections:
+        if (pos > loadedModules[0]):
+            return pos
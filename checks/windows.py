@@ -10,6 +10,32 @@ from .graphics import *
 from .utils.windowsversions import *
 
 
+registerTerms(
+    'Adapter 0',
+    'Adapter 1',
+    'Adapter 2',
+    'Loading up D3D11',
+    'refresh=',
+    ' Hz] initialized',
+    'samples per sec: ',
+    'Microsoft Basic Render Driver',
+    'Warning: The OpenGL renderer is currently in use.',
+    'Game DVR Background Recording: On',
+    'Game Mode: On',
+    'Game Mode: Off',
+    'Hardware GPU Scheduler: On',
+    'Hardware GPU Scheduler: Probably On',
+    'Hardware-Accelerated GPU Scheduling enabled on adapter!',
+    'NVIDIA GeForce 940',
+    'NVENC encoder',
+    'Windows Version:',
+    'Running as administrator',
+    'Windows Version',
+    'Windows ARM64: Running with x64 emulation',
+)
+
+
+@check(triggers=('Loading up D3D11',))
 def checkGPU(lines):
     def getAdapterName(adapterString):
         return adapterString.split(': ')[-1].strip()
@@ -92,9 +118,10 @@ def getMonitorRefreshes(lines):
     return refreshes
 
 
+@check(triggers=('refresh=',), platform='windows')
 def checkRefreshes(lines):
     refreshes = getMonitorRefreshes(lines)
-    verinfo = getWindowsVersion(lines)
+    verinfo = getFacts(lines).windows_version
 
     # Our log doesn't have any refresh rates, so bail
     if len(refreshes) == 0:
@@ -186,6 +213,7 @@ def getWasapiSampleRates(lines):
     return samples
 
 
+@check(triggers=(' Hz] initialized',))
 def checkWasapiSamples(lines):
     obsSampleLines = search('samples per sec: ', lines)
     obsSample = ""
@@ -229,6 +257,7 @@ def checkWasapiSamples(lines):
         ]
 
 
+@check(triggers=('Microsoft Basic Render Driver',))
 def checkMicrosoftSoftwareGPU(lines):
     if (len(search('Microsoft Basic Render Driver', lines)) > 0):
         return [
@@ -240,6 +269,7 @@ def checkMicrosoftSoftwareGPU(lines):
         ]
 
 
+@check(triggers=('Warning: The OpenGL renderer is currently in use.',))
 def checkOpenGLonWindows(lines):
     opengl = search('Warning: The OpenGL renderer is currently in use.', lines)
     if (len(opengl) > 0):
@@ -252,6 +282,7 @@ def checkOpenGLonWindows(lines):
         ]
 
 
+@check(triggers=('Game DVR Background Recording: On',), region='header')
 def checkGameDVR(lines):
     if search('Game DVR Background Recording: On', lines):
         return [
@@ -266,8 +297,9 @@ def checkGameDVR(lines):
         ]
 
 
+@check(platform='windows', region='header')
 def checkGameMode(lines):
-    verinfo = getWindowsVersion(lines)
+    verinfo = getFacts(lines).windows_version
 
     if not verinfo or verinfo["version"] != "10.0":
         return
@@ -301,6 +333,7 @@ def checkGameMode(lines):
         ]
 
 
+@check()
 def checkWin10Hags(lines):
     d3dAdapter = search("Loading up D3D11", lines)
     hagsMessage = _(
@@ -321,6 +354,7 @@ def checkWin10Hags(lines):
         return [LEVEL_CRITICAL, _("Hardware-accelerated GPU Scheduler"), hagsMessage]
 
 
+@check(triggers=('NVIDIA GeForce 940', 'NVENC encoder'))
 def check940(lines):
     gpu = search('NVIDIA GeForce 940', lines)
     attempt = search('NVENC encoder', lines)
@@ -343,6 +377,7 @@ def getWindowsVersionLine(lines):
         return versionLines[0]
 
 
+@fact('windows_version')
 def getWindowsVersion(lines):
     versionLine = getWindowsVersionLine(lines)
 
@@ -380,8 +415,9 @@ def getWindowsVersion(lines):
     return
 
 
+@check(platform='windows', region='header')
 def checkWindowsVer(lines):
-    verinfo = getWindowsVersion(lines)
+    verinfo = getFacts(lines).windows_version
     if not verinfo:
         return
 
@@ -412,8 +448,8 @@ def checkWindowsVer(lines):
 
     # special case for OBS 24.0.3 and earlier, which report Windows 10/1909
     # as being Windows 10/1903
-    versionString = getOBSVersionString(lines)
-    if parse_version(versionString) <= parse_version("24.0.3"):
+    versionString = getFacts(lines).obs_version
+    if versionString is not None and parse_version(versionString) <= parse_version("24.0.3"):
         if verinfo["version"] == "10.0" and verinfo["release"] == 1903:
             return [
                 LEVEL_INFO,
@@ -444,8 +480,9 @@ def checkWindowsVer(lines):
     return [LEVEL_INFO, wv, msg]
 
 
+@check(platform='windows', region='header')
 def checkWindowsARM64(lines):
-    verinfo = getWindowsVersion(lines)
+    verinfo = getFacts(lines).windows_version
     if verinfo:
         if verinfo["arm"]:
             return [
@@ -455,10 +492,11 @@ def checkWindowsARM64(lines):
             ]
 
 
+@check(triggers=('Running as administrator',), region='header')
 def checkAdmin(lines):
     adminlines = search('Running as administrator', lines)
     if ((len(adminlines) > 0) and (adminlines[0].split()[-1] == 'false')):
-        renderlag = getRenderLag(lines)
+        renderlag = getFacts(lines).render_lag_pct
 
         if renderlag >= 3:
             return [
@@ -479,10 +517,11 @@ def checkAdmin(lines):
         ]
 
 
+@check(triggers=('Windows Version',), region='header')
 def check32bitOn64bit(lines):
     winVersion = search('Windows Version', lines)
-    obsVersion = getOBSVersionLine(lines)
-    if (len(winVersion) > 0 and '64-bit' in winVersion[0] and ('32-bit' in obsVersion or '32bit' in obsVersion)):
+    obsVersion = getFacts(lines).obs_version_line
+    if (len(winVersion) > 0 and '64-bit' in winVersion[0] and obsVersion is not None and ('32-bit' in obsVersion or '32bit' in obsVersion)):
         # thx to secretply for the bugfix
         return [
             LEVEL_WARNING,
@@ -493,6 +532,7 @@ def check32bitOn64bit(lines):
         ]
 
 
+@check(triggers=('Windows ARM64: Running with x64 emulation',), region='header')
 def checkWindowsARM64EmulationStatus(lines):
     if (len(search('Windows ARM64: Running with x64 emulation', lines)) > 0):
         return [
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 
 import argparse
+import multiprocessing
+import os
+import signal
 import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import i18n
 from i18n import _
 
 from checks.vars import *
@@ -18,10 +24,55 @@ from checks.linux import *
 from checks.windows import *
 
 from checks.utils.fetchers import *
+from checks.utils.asyncfetchers import *
 from checks.utils.utils import *
 from checks.utils.windowsversions import *
+from checks.utils.cache import LRUCache, sourceVersion
+from checks.utils import fetchers
 
 
+# Checks report their messages in this order, the one they were written in
+# before they registered themselves.
+orderChecks([
+    checkObsVersion, checkDual, checkAutoconfig, checkCPU, checkAMDdrivers, checkNVIDIAdrivers,
+    checkGPU, checkRefreshes, checkInit, checkWayland, checkNVIDIAdriversEGL, checkNVENC, check940,
+    checkKiller, checkWifi, checkBind, checkWindowsVer, checkWindowsARM64, checkMacVer, checkAdmin,
+    checkImports, check32bitOn64bit, checkWindowsARM64EmulationStatus,
+    checkRosettaTranslationStatus, checkAttempt, checkMP4, checkPreset, checkCustom,
+    checkBrowserAccel, checkAudioBuffering, checkDrop, checkRenderLag, checkEncodeError,
+    checkEncoding, checkMulti, checkStreamSettings, checkMicrosoftSoftwareGPU, checkWasapiSamples,
+    checkOpenGLonWindows, checkGameDVR, checkGameMode, checkWin10Hags, checkNICSpeed,
+    checkDynamicBitrate, checkNetworkOptimizations, checkTCPPacing, checkStreamDelay,
+    checkUnknownEncoder, checkBrowserSource, checkMonitoringDevice, checkPluginList, checkVantage,
+    checkPortableMode, checkSafeMode, checkDistro, checkFlatpak, checkSnapPackage,
+    checkX11Captures, checkDesktopEnvironment, checkMissingModules, checkLinuxVCam,
+    checkMacPermissions, checkVideoSettings
+])
+
+# compiled once all checks have registered their search terms
+termMatcher = getTermMatcher()
+
+# Identifies the code and translations producing results, so that cached
+# results are never reused for a different ruleset.
+basePath = os.path.dirname(os.path.abspath(__file__))
+rulesetVersion = sourceVersion(os.path.join(basePath, 'checks'), os.path.join(basePath, 'locale'),
+                               os.path.abspath(__file__), os.path.join(basePath, 'i18n.py'))
+
+# results of analyzeBuffer(), keyed by (log hash, ruleset version, language)
+resultCache = LRUCache(maxEntries=1024, maxBytes=32 << 20)
+
+# analysed by initWorker() to warm up worker processes
+warmupLog = """\
+16:32:10.102: CPU Name: Intel(R) Core(TM) i7-8750H CPU @ 2.20GHz
+16:32:10.102: Windows Version: 10.0 Build 19045 (release: 22H2; revision: 3693; 64-bit)
+16:32:10.125: OBS 30.0.2 (64-bit, windows)
+16:32:11.570: Loaded Modules:
+16:32:11.570:   obs-ffmpeg.dll
+16:32:12.001: ---------------------------------
+16:32:12.001: [x264 encoder: 'simple_video_recording'] preset: veryfast
+16:32:12.001: Output 'simple_stream': Number of skipped frames due to encoding lag: 0/100 (0.0%)
+"""
+
 # main functions
 ##############################################
 
@@ -78,132 +129,135 @@ def getResults(messages):
     return results
 
 
-def doAnalysis(url=None, filename=None):
+def analyzeLog(logLines, stream=None):
+    """Returns the messages for a LogIndex of a whole log. Checks that already
+    ran incrementally in a StreamAnalysis are taken from there."""
     messages = []
-    success = False
-    logLines = []
+    classic, m = checkClassic(logLines)
+    crash, m = checkCrash(logLines)
+    messages.append(m)
+    if (not classic and not crash):
+        if stream is None:
+            messages.extend(runChecks(logLines))
+        else:
+            messages.extend(stream.results())
+        m = parseScenes(logLines)
+        # TODO Verify .extend() can be used for parseScenes
+        seenMessages = set()
+        for sublist in m:
+            if sublist is not None:
+                for item in sublist:
+                    itemTuple = tuple(item)
+                    if itemTuple not in seenMessages:
+                        messages.append(item)
+                        seenMessages.add(itemTuple)
+    return messages
 
-    if url is not None:
-        gist = matchGist(url)
-        haste = matchHaste(url)
-        obs = matchObs(url)
-        pastebin = matchPastebin(url)
-        discord = matchDiscord(url)
-        if (gist):
-            gistObject = getGist(gist.groups()[-1])
-            logLines = getLinesGist(gistObject)
-            messages.append(getDescriptionGist(gistObject))
-            success = True
-        elif (haste):
-            hasteObject = getHaste(haste.groups()[-1])
-            logLines = getLinesHaste(hasteObject)
-            messages.append(getDescription(logLines))
-            success = True
-        elif (obs):
-            obslogObject = getObslog(obs.groups()[-1])
-            logLines = getLinesObslog(obslogObject)
-            messages.append(getDescription(logLines))
-            success = True
-        elif (pastebin):
-            pasteObject = getRawPaste(pastebin.groups()[-1])
-            logLines = getLinesPaste(pasteObject)
-            messages.append(getDescription(logLines))
-            success = True
-        elif (discord):
-            attachment = discord.groups()[-1]
-            if attachment == "message":
-                attachment = discord.groups()[-2]
-            pasteObject = getRawDiscord(attachment)
-            if len(pasteObject) > 0:
-                logLines = getLinesDiscord(pasteObject)
-                messages.append(getDescription(logLines))
-                success = True
 
-    elif filename is not None:
-        logLines = getLinesLocal(filename)
-        messages.append(getDescription(logLines))
-        success = True
-
-    if (success):
-        classic, m = checkClassic(logLines)
-        crash, m = checkCrash(logLines)
-        messages.append(m)
-        if (not classic and not crash):
-            messages.extend([
-                checkObsVersion(logLines),
-                checkDual(logLines),
-                checkAutoconfig(logLines),
-                checkCPU(logLines),
-                checkAMDdrivers(logLines),
-                checkNVIDIAdrivers(logLines),
-                checkGPU(logLines),
-                checkRefreshes(logLines),
-                checkInit(logLines),
-                checkWayland(logLines),
-                checkNVIDIAdriversEGL(logLines),
-                checkNVENC(logLines),
-                check940(logLines),
-                checkKiller(logLines),
-                checkWifi(logLines),
-                checkBind(logLines),
-                checkWindowsVer(logLines),
-                checkWindowsARM64(logLines),
-                checkMacVer(logLines),
-                checkAdmin(logLines),
-                checkImports(logLines),
-                check32bitOn64bit(logLines),
-                checkWindowsARM64EmulationStatus(logLines),
-                checkRosettaTranslationStatus(logLines),
-                checkAttempt(logLines),
-                checkMP4(logLines),
-                checkPreset(logLines),
-                checkCustom(logLines),
-                checkBrowserAccel(logLines),
-                checkAudioBuffering(logLines),
-                checkDrop(logLines),
-                checkRenderLag(logLines),
-                checkEncodeError(logLines),
-                checkEncoding(logLines),
-                checkMulti(logLines),
-                checkStreamSettings(logLines),
-                checkMicrosoftSoftwareGPU(logLines),
-                checkWasapiSamples(logLines),
-                checkOpenGLonWindows(logLines),
-                checkGameDVR(logLines),
-                checkGameMode(logLines),
-                checkWin10Hags(logLines),
-                checkNICSpeed(logLines),
-                checkDynamicBitrate(logLines),
-                checkNetworkOptimizations(logLines),
-                checkTCPPacing(logLines),
-                checkStreamDelay(logLines),
-                checkUnknownEncoder(logLines),
-                checkBrowserSource(logLines),
-                checkMonitoringDevice(logLines),
-                checkPluginList(logLines),
-                checkVantage(logLines),
-                checkPortableMode(logLines),
-                checkSafeMode(logLines),
-                checkDistro(logLines),
-                checkFlatpak(logLines),
-                checkSnapPackage(logLines),
-                checkX11Captures(logLines),
-                checkDesktopEnvironment(logLines),
-                checkMissingModules(logLines),
-                checkLinuxVCam(logLines),
-                checkMacPermissions(logLines)
-            ])
-            messages.extend(checkVideoSettings(logLines))
-            m = parseScenes(logLines)
-            # TODO Verify .extend() can be used for parseScenes
-            seenMessages = set()
-            for sublist in m:
-                if sublist is not None:
-                    for item in sublist:
-                        itemTuple = tuple(item)
-                        if itemTuple not in seenMessages:
-                            messages.append(item)
-                            seenMessages.add(itemTuple)
+def analyzeStream(lines, description=None):
+    """Analyses a log given as an iterable of lines, such as an open file,
+    in a single pass over it. Returns the same messages as doAnalysis()."""
+    stream = StreamAnalysis()
+    for line in lines:
+        stream.feed(line)
+    logLines = stream.close()
+    messages = [description or getDescription(logLines)]
+    messages.extend(analyzeLog(logLines, stream))
+    return [i for i in messages if i is not None]
+
+
+def followLog(filename, interval=2.0):
+    """Analyses a log file while OBS is still writing it.
+
+    Only the lines appended since the last poll are read and fed to a
+    StreamAnalysis, and the summary is printed again whenever the findings
+    change. Runs until interrupted."""
+    tail = LogTail(filename)
+    stream = StreamAnalysis()
+    messages = None
+    summary = None
+    try:
+        while True:
+            lines = tail.read()
+            if lines is None:
+                stream = StreamAnalysis()
+                messages = None
+                continue
+            if lines or messages is None:
+                for line in lines:
+                    stream.feed(line)
+                logLines = stream.snapshot()
+                messages = [getDescription(logLines)]
+                messages.extend(analyzeLog(logLines, stream))
+                messages = [i for i in messages if i is not None]
+                if getSummary(messages) != summary:
+                    summary = getSummary(messages)
+                    print(time.strftime("%H:%M:%S"))
+                    print(summary, flush=True)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    return messages
+
+
+def analyzeBuffer(logLines, executor=None):
+    """Runs every check over a LogBuffer of a whole log and returns their
+    messages as (level, title, text) tuples, which are cheap to send back
+    from a worker process. The log is searched in the processes of executor
+    if one is given."""
+    logLines = LogIndex(logLines)
+    # The pure-Python automaton is slower than one find per term, so
+    # only sweep for every term up front when the C automaton can
+    # scan the log (or a process pool shares the work).
+    if executor is not None:
+        primeParallel(logLines, executor)
+    elif termMatcher.accelerated and logLines.lines.isText:
+        logLines.prime(termMatcher)
+    return [tuple(m) for m in analyzeLog(logLines) if m is not None]
+
+
+def initWorker():
+    """Initializer of the processes of an analysis pool. Importing this
+    module registered the checks and compiled their patterns and the term
+    matcher; analysing a short log once also fills the caches of the
+    patterns compiled on first use. Interrupts are left to the parent."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    analyzeBuffer(LogBuffer(warmupLog))
+
+
+def startAnalysisPool(processes):
+    """Returns a process pool to pass to analyzeLines() as analysisPool.
+    Where possible its workers are forked from a server process that has
+    already imported the checks, instead of each importing them again."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['loganalyzer'])
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(processes, mp_context=context, initializer=initWorker)
+
+
+def analyzeLines(description, logLines, executor=None, analysisPool=None, onAnalysis=None):
+    """Returns the messages for a log fetched by getLog(), or a NO LOG message
+    if logLines is None. The log is searched in the processes of executor if
+    one is given, or analysed as a whole in one of the processes of
+    analysisPool. Logs with the same content are only analysed once; later
+    ones get the messages from resultCache. onAnalysis, if given, is called
+    whenever the checks actually run."""
+    messages = []
+    if logLines is not None:
+        messages.append(description)
+        key = (logLines.digest(), rulesetVersion, i18n.lang)
+        results = resultCache.get(key)
+        if results is None:
+            if onAnalysis is not None:
+                onAnalysis()
+            if analysisPool is not None:
+                results = analysisPool.submit(analyzeBuffer, logLines).result()
+            else:
+                results = analyzeBuffer(logLines, executor)
+            resultCache.put(key, results, sum(len(str(m)) for m in results))
+        messages.extend(results)
     else:
         messages.append(
             [LEVEL_CRITICAL, _("NO LOG"), _("URL or file doesn't contain a log.")]
@@ -214,6 +268,37 @@ def doAnalysis(url=None, filename=None):
     return (ret)
 
 
+def doAnalysis(url=None, filename=None, stream=False, executor=None):
+    if stream and filename is not None:
+        try:
+            with open(filename, "r", encoding="utf-8", errors="replace", newline="") as f:
+                return analyzeStream(f)
+        except OSError:
+            return analyzeLines(None, None)
+    if stream and url is not None:
+        site, pasteId = matchUrl(url)
+        try:
+            if site == 'gist':
+                description, lines = streamGist(pasteId)
+                return analyzeStream(lines, description)
+            if site in rawSites:
+                return analyzeStream(streamLog(site, pasteId))
+        except PasteNotFound:
+            return analyzeLines(None, None)
+
+    description, logLines = None, None
+    if url is not None:
+        description, logLines = getLog(*matchUrl(url))
+    elif filename is not None:
+        logLines = getLinesLocal(filename)
+        if logLines is not None:
+            try:
+                return analyzeLines(getDescription(logLines), logLines, executor)
+            finally:
+                logLines.close()  # unmaps the file now rather than whenever it is collected
+    return analyzeLines(description, logLines, executor)
+
+
 def main():
     parser = argparse.ArgumentParser()
     loggroup = parser.add_mutually_exclusive_group(required=True)
@@ -224,9 +309,40 @@ def main():
     loggroup.add_argument(
         "--file", "-f", dest="file", default=None, help=_("local filename with log")
     )
+    loggroup.add_argument(
+        "--follow", dest="follow", default=None,
+        help=_("local filename with a log that is still being written; print the summary whenever it changes")
+    )
+    parser.add_argument(
+        "--stream", dest="stream", action="store_true",
+        help=_("analyse a local file or paste in a single pass while reading it")
+    )
+    parser.add_argument(
+        "--max-log-mb", dest="maxLogMB", type=int, default=64,
+        help=_("megabytes a downloaded log may have")
+    )
+    parser.add_argument(
+        "--jobs", "-j", dest="jobs", type=int, default=1,
+        help=_("number of processes to search very large logs with")
+    )
+    parser.add_argument(
+        "--interval", dest="interval", type=float, default=2.0,
+        help=_("seconds between polls of a followed log")
+    )
     flags = parser.parse_args()
+    fetchers.maxLogBytes = flags.maxLogMB << 20
 
-    msgs = doAnalysis(url=flags.url, filename=flags.file)
+    if flags.follow is not None:
+        msgs = followLog(flags.follow, flags.interval)
+        if msgs:
+            print(getResults(msgs))
+        return
+
+    if flags.jobs > 1:
+        with ProcessPoolExecutor(flags.jobs) as executor:
+            msgs = doAnalysis(url=flags.url, filename=flags.file, stream=flags.stream, executor=executor)
+    else:
+        msgs = doAnalysis(url=flags.url, filename=flags.file, stream=flags.stream)
     print(getSummary(msgs))
     print(getResults(msgs))
 
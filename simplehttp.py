@@ -2,18 +2,293 @@
 
 import logging
 import argparse
+import collections
+import contextlib
+import gc
+import ipaddress
+import math
+import mmap
+import os
+import signal
+import socket
+import time
 from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
 import asyncio
+import aiohttp
 from aiohttp import web
 import json
 import loganalyzer as analyze
+from checks.utils import fetchers
+from checks.utils.cache import LRUCache
 
 from i18n import _
 
 loop = asyncio.get_event_loop()
 threadPool = futures.ThreadPoolExecutor(thread_name_prefix='loganalyzer: worker thread')
+analysisPool = None  # Processes the checks run in, if any; threads only wait for them
+analysisProcesses = 0
 app = web.Application()
 
+inFlight = {}  # Paste key -> task fetching and analysing it, only touched on the event loop
+
+
+class Counters(object):
+    """Request counters of every worker process, kept in shared memory so that any worker can report the totals.
+
+    Each process only writes the slot it was given, and reads and writes its own counters like a dict."""
+
+    names = ('requests', 'tasks', 'analyses', 'coalesced', 'failed', 'rejected', 'limited', 'restarts')
+
+    def __init__(self, slots=1):
+        self.slots = slots
+        self.slot = 0
+        self.buffer = mmap.mmap(-1, slots * len(self.names) * 8)  # Anonymous mappings stay shared with forked children
+        self.values = memoryview(self.buffer).cast('q')
+
+    def offset(self, name, slot=None):
+        return (self.slot if slot is None else slot) * len(self.names) + self.names.index(name)
+
+    def keys(self):
+        return self.names
+
+    def __getitem__(self, name):
+        return self.values[self.offset(name)]
+
+    def __setitem__(self, name, value):
+        self.values[self.offset(name)] = value
+
+    def add(self, slot, name, value=1):
+        self.values[self.offset(name, slot)] += value
+
+    def totals(self):
+        """Returns the counters summed over every slot."""
+        return {name: sum(self.values[self.offset(name, slot)] for slot in range(self.slots)) for name in self.names}
+
+
+stats = Counters()
+
+
+class Overloaded(Exception):
+    """A request was turned away because too much work is queued. retryAfter is the number of seconds after which the queue is expected to have room."""
+
+    def __init__(self, gate, retryAfter):
+        super().__init__('{} queue full'.format(gate))
+        self.retryAfter = retryAfter
+
+
+class JobClass(object):
+    """Jobs of one class waiting for a Gate. At most limit of them run at once, if limit is set, and at most queue more wait."""
+
+    def __init__(self, weight=1, limit=None, queue=0):
+        self.weight = weight
+        self.limit = limit
+        self.queue = queue
+        self.active = 0
+        self.waiting = collections.deque()  # Futures of the queued jobs, resolved when a slot is handed to them
+        self.pending = 0  # Jobs admitted by Gate.reserve() that have not asked for their slot yet
+        self.passed = 0.0  # Virtual time of the class for the weighted fair dequeueing
+        self.admitted = 0
+        self.rejected = 0
+        self.wait = 0.0  # Moving averages, in seconds
+        self.duration = 0.0
+
+    def stats(self):
+        return {'active': self.active, 'limit': self.limit, 'pending': self.pending, 'waiting': len(self.waiting), 'queue': self.queue, 'weight': self.weight,
+                'admitted': self.admitted, 'rejected': self.rejected, 'wait': round(self.wait, 3), 'duration': round(self.duration, 3)}
+
+
+class Gate(object):
+    """Admits at most slots jobs at once, queues more per class up to its queue length, and turns away the rest with Overloaded.
+
+    Used as `async with gate.slot(name):` around a job of the class name. Jobs of a class start in arrival order; a free slot goes
+    to the waiting class that is furthest behind its share, every class getting slots in proportion to its weight (stride scheduling).
+    Without classes all jobs share one FIFO queue of queue entries."""
+
+    def __init__(self, name, slots, queue=0, classes=None):
+        self.name = name
+        self.slots = slots
+        self.active = 0
+        self.classes = classes or {name: JobClass(queue=queue)}
+        self.default = next(iter(self.classes))
+        self.virtual = 0.0  # Virtual time of the last job started
+
+    def jobClass(self, name):
+        return self.classes[name or self.default]
+
+    def runnable(self, jobClass):
+        return self.active < self.slots and (not jobClass.limit or jobClass.active < jobClass.limit)
+
+    def full(self, name=None):
+        """Returns whether a new job of the class would find neither a slot nor a place in its queue. Pending jobs count as
+        taking a slot if one is free, or else a place in the queue; those of other classes are assumed to take a slot."""
+        jobClass = self.jobClass(name)
+        free = self.slots - self.active - sum(c.pending for c in self.classes.values() if c is not jobClass)
+        if jobClass.limit:
+            free = min(free, jobClass.limit - jobClass.active)
+        return jobClass.pending + len(jobClass.waiting) >= max(free, 0) + jobClass.queue
+
+    def retryAfter(self, name=None):
+        """Seconds until the jobs ahead of a new one of the class are expected to be done."""
+        jobClass = self.jobClass(name)
+        slots = min(self.slots, jobClass.limit or self.slots)
+        return max(1, math.ceil(jobClass.duration * (jobClass.pending + len(jobClass.waiting) + 1) / slots))
+
+    def check(self, name=None):
+        if self.full(name):
+            self.jobClass(name).rejected += 1
+            raise Overloaded(name or self.name, self.retryAfter(name))
+
+    def reserve(self, name=None):
+        """Admits a job of the class that will ask for its slot later, with slot(name, reserved=True), or raises Overloaded. Until
+        then it counts against the queue; unreserve() gives its place back if it never asks."""
+        self.check(name)
+        self.jobClass(name).pending += 1
+
+    def unreserve(self, name=None):
+        self.jobClass(name).pending -= 1
+
+    def start(self, jobClass):
+        jobClass.active += 1
+        self.active += 1
+        self.virtual = jobClass.passed
+        jobClass.passed += 1 / jobClass.weight
+
+    async def acquire(self, name=None):
+        jobClass = self.jobClass(name)
+        if not jobClass.waiting and self.runnable(jobClass):
+            self.start(jobClass)
+            return
+        if not jobClass.waiting:  # A class that was idle gets no credit for it
+            jobClass.passed = max(jobClass.passed, self.virtual)
+        waiter = loop.create_future()
+        jobClass.waiting.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():  # The slot was handed over just before; pass it on
+                self.release(name)
+            else:
+                jobClass.waiting.remove(waiter)
+            raise
+
+    def release(self, name=None):
+        jobClass = self.jobClass(name)
+        jobClass.active -= 1
+        self.active -= 1
+        while self.active < self.slots:
+            ready = [c for c in self.classes.values() if c.waiting and self.runnable(c)]
+            if not ready:
+                break
+            jobClass = min(ready, key=lambda c: c.passed)
+            waiter = jobClass.waiting.popleft()
+            if not waiter.done():
+                self.start(jobClass)
+                waiter.set_result(None)  # The slot goes to the next job in line
+
+    @contextlib.asynccontextmanager
+    async def slot(self, name=None, reserved=False):
+        """Waits for a free slot for a job of the class name and holds it, or raises Overloaded if its queue is full. A job
+        admitted by reserve() is never turned away."""
+        if reserved:
+            self.unreserve(name)
+        else:
+            self.check(name)
+        jobClass = self.jobClass(name)
+        queued = time.monotonic()
+        await self.acquire(name)
+        jobClass.admitted += 1
+        started = time.monotonic()
+        jobClass.wait += (started - queued - jobClass.wait) * 0.1
+        try:
+            yield
+        finally:
+            jobClass.duration += (time.monotonic() - started - jobClass.duration) * 0.1
+            self.release(name)
+
+    def stats(self):
+        if len(self.classes) == 1:
+            return dict(self.jobClass(None).stats(), slots=self.slots)
+        return {'active': self.active, 'slots': self.slots, 'classes': {n: c.stats() for n, c in self.classes.items()}}
+
+
+class RateLimiter(object):
+    """Token buckets limiting every client to rate requests per second, in bursts of up to burst requests.
+
+    Clients are told apart by address, or by API key if they send one listed in keys, which maps it to its own (rate, burst).
+    Only the buckets of the maxClients most recently seen clients are kept; a client whose bucket was dropped starts with a full one."""
+
+    def __init__(self, rate, burst, maxClients=65536, keys=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.keys = keys or {}
+        self.clock = clock
+        self.buckets = LRUCache(maxEntries=maxClients, clock=clock)  # Client -> [tokens, time they were counted]
+        self.limited = 0
+
+    def take(self, address, apiKey=None):
+        """Takes a token from the bucket of the client and returns 0, or the seconds until it has one again if it is empty."""
+        if apiKey in self.keys:
+            client = ('key', apiKey)
+            rate, burst = self.keys[apiKey]
+        else:
+            client = ('address', address)
+            rate, burst = self.rate, self.burst
+        if rate <= 0:
+            return 0
+        now = self.clock()
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = [burst, now]
+            self.buckets.put(client, bucket, 1)
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        self.limited += 1
+        return (1 - bucket[0]) / rate
+
+    def stats(self):
+        buckets = self.buckets.stats()
+        return {'clients': buckets['entries'], 'evictions': buckets['evictions'], 'limited': self.limited}
+
+
+def loadApiKeys(path):
+    """Reads the API keys with their own rate limits from a JSON file of the form {"KEY": {"rate": N, "burst": N}, ...}."""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    return {key: (float(entry['rate']), float(entry['burst'])) for key, entry in entries.items()}
+
+
+def isTrustedProxy(address):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in trustedProxies)
+
+
+def clientAddress(request):
+    """Returns the address of the client, taken from X-Forwarded-For when the request came through a trusted proxy."""
+    address = request.remote
+    if not isTrustedProxy(address):
+        return address
+    hops = [hop.strip() for value in request.headers.getall('X-Forwarded-For', []) for hop in value.split(',')]
+    for hop in reversed(hops):  # The nearest hops were added by our proxies, anything before them may be forged by the client
+        address = hop
+        if not isTrustedProxy(hop):
+            break
+    return address
+
+
+trustedProxies = []  # Networks of the proxies whose X-Forwarded-For is believed
+rateLimiter = None  # Created by runServer(), so every worker counts its own requests
+jobClasses = ('html', 'detailed', 'json', 'batch')  # Classes of analyses, in the order of their default weights
+fetchGate = None  # Gates of the downloads and the analyses, created by runServer()
+analysisGate = None
+
 with open("templates/index.html", "r") as f:  # Grab main HTML page
     htmlTemplate = f.read()
 
@@ -89,9 +364,11 @@ def getDescr(messages):
     return res
 
 
-def genFullHtmlResponse(url):
-    """Runs an analysis and returns a full HTML page with the response."""
-    msgs = analyze.doAnalysis(url=url)
+def genFullHtmlResponse(url, msgs=None):
+    """Returns a full HTML page with the results of an analysis, running it
+    unless its messages are given."""
+    if msgs is None:
+        msgs = analyze.doAnalysis(url=url)
     crit, warn, info = getSummaryHTML(msgs)
     details = getDetailsHTML(msgs)
     response = htmlTemplate.format(ph=url,
@@ -116,10 +393,11 @@ def genEmptyHtmlResponse():
     return response_body
 
 
-def genJsonResponse(url, detailed):
-    """Runs an analysis and returns the results as JSON."""
-    msgs = []
-    msgs = analyze.doAnalysis(url=url)
+def genJsonResponse(url, detailed, msgs=None):
+    """Returns the results of an analysis as JSON, running it unless its
+    messages are given."""
+    if msgs is None:
+        msgs = analyze.doAnalysis(url=url)
     critical = []
     warning = []
     info = []
@@ -136,18 +414,90 @@ def genJsonResponse(url, detailed):
     return {"critical": critical, "warning": warning, "info": info}
 
 
-def sync_request_handler(request):
-    """Non-async request handler processed within the thread pool. Do not share global resources without a Lock."""
+def countAnalysis():
+    """Counts an analysis that was not answered from the result cache; called from the thread running it."""
+    def count():
+        stats['analyses'] += 1
+    loop.call_soon_threadsafe(count)
+
+
+async def fetchAndAnalyze(session, site, pasteId, jobClass=None):
+    """Downloads a log on the event loop and analyses it in the process pool, or the thread pool without one, scheduled as a job of jobClass.
+
+    Its places in the download and analysis queues must have been reserved."""
+    global analysisPool
+    stats['tasks'] += 1
+    try:
+        async with fetchGate.slot(reserved=True):
+            description, logLines = await analyze.getLogAsync(session, site, pasteId)
+    except BaseException:
+        analysisGate.unreserve(jobClass)  # The place in the analysis queue is not needed anymore
+        raise
+    if logLines is None:  # Missing or holding no log: NO LOG needs no analysis, so it must not wait for one
+        analysisGate.unreserve(jobClass)
+        return analyze.analyzeLines(description, logLines)
+    async with analysisGate.slot(jobClass, reserved=True):
+        for attempt in range(2):  # A log whose worker died is analysed once more, in the pool started instead
+            pool = analysisPool
+            try:
+                # The thread only checks the result cache and waits for the worker process
+                return await loop.run_in_executor(None, analyze.analyzeLines, description, logLines, None, pool, countAnalysis)
+            except BrokenProcessPool:
+                if pool is analysisPool:  # A worker died, e.g. killed for its memory use; the pool cannot be used anymore
+                    logging.error('Analysis process died, restarting the pool')
+                    analysisPool = analyze.startAnalysisPool(analysisProcesses)
+                    pool.shutdown(wait=False)
+                if attempt:
+                    raise
+
+
+async def analyzeUrl(session, url, jobClass=None):
+    """Returns the messages for the log at url. Concurrent requests for the same paste share a single download and analysis.
+
+    The analysis of a new paste is scheduled as a job of jobClass. Raises Overloaded if its download or analysis would have to queue behind too many others."""
+    site, pasteId = analyze.matchUrl(url)
+    key = analyze.pasteKey(site, pasteId)
+    task = inFlight.get(key)
+    if task is None:
+        fetchGate.reserve()  # Turns a new paste away now rather than after downloading it
+        try:
+            analysisGate.reserve(jobClass)
+        except Overloaded:
+            fetchGate.unreserve()
+            raise
+        task = loop.create_task(fetchAndAnalyze(session, site, pasteId, jobClass))
+        inFlight[key] = task
+        task.add_done_callback(lambda t: inFlight.pop(key, None))
+    else:
+        stats['coalesced'] += 1
+    return await asyncio.shield(task)  # A client going away must not cancel the work others wait for
+
+
+def requestClass(format, detailed, query):
+    """Returns the class the analysis for a request is scheduled in: people using the web page come first, bots asking for JSON next
+    and clients that mark their requests with batch=true last."""
+    if 'batch' in query and query['batch'] == 'true':
+        return 'batch'
+    if format == 'json':
+        return 'detailed' if detailed else 'json'
+    return 'html'
+
+
+async def request_handler(request):
+    """Async request handler. Downloads the log on the event loop and only submits its analysis to the thread pool."""
     query = request.query  # Get HTTP query string as a MultiDict
     format = 'html'
     if 'format' in query:  # Check for requested response format
         format = query['format'].lower()
 
-    logging.info('New HTTP Request | Remote: {} | Format: {} | Url: {}'.format(request.remote, format, 'url' in query))
+    address = clientAddress(request)
+    logging.info('New HTTP Request | Remote: {} | Format: {} | Url: {}'.format(address, format, 'url' in query))
+    stats['requests'] += 1
 
     if 'url' in query:
         url = query['url']
         detailed = 'detailed' in query and query['detailed'] == 'true'
+        jobClass = requestClass(format, detailed, query)
         if not checkUrl(url):  # Return empty data/page if URL is invalid
             logging.info('Invalid URL: {}'.format(url))
             if format == 'json':
@@ -156,13 +506,45 @@ def sync_request_handler(request):
             else:
                 logging.info('Returning default HTML response.')
                 return web.Response(text=genEmptyHtmlResponse(), content_type='text/html')
+        status = 200
+        headers = None
+        retryAfter = rateLimiter.take(address, request.headers.get('X-API-Key'))
+        if retryAfter:
+            logging.warning('Request limited: {}'.format(address))
+            stats['limited'] += 1
+            status = 429
+            headers = {'Retry-After': str(math.ceil(retryAfter))}
+            msgs = [[analyze.LEVEL_CRITICAL, _("TOO MANY REQUESTS"), _("You have sent too many logs in a short time, please try again in a few seconds.")]]
+        else:
+            try:
+                msgs = await analyzeUrl(request.app['httpSession'], url, jobClass)
+            except Overloaded as e:
+                logging.warning('Request rejected: {}'.format(e))
+                stats['rejected'] += 1
+                status = 503
+                headers = {'Retry-After': str(e.retryAfter)}
+                msgs = [[analyze.LEVEL_CRITICAL, _("SERVER BUSY"), _("Too many logs are being analysed right now, please try again in a few seconds.")]]
+            except BrokenProcessPool:
+                logging.error('Analysis failed twice, its process died: {}'.format(url))
+                status = 503
+                msgs = [[analyze.LEVEL_CRITICAL, _("ANALYSIS FAILED"), _("The log could not be analysed, please try again later.")]]
+            except analyze.PasteTooLarge as e:
+                logging.warning('Download refused: {}'.format(e))
+                stats['failed'] += 1
+                status = 502
+                msgs = [[analyze.LEVEL_CRITICAL, _("LOG TOO LARGE"), _("The log is too large to be analysed.")]]
+            except analyze.FetchError as e:
+                logging.warning('Download failed: {}'.format(e))
+                stats['failed'] += 1
+                status = 502
+                msgs = [[analyze.LEVEL_CRITICAL, _("DOWNLOAD FAILED"), _("The log could not be downloaded from the paste site, please try again later.")]]
         if format == 'json':
             logging.info('Returning JSON response for url: {}'.format(url))
-            response = genJsonResponse(url, detailed)
-            return web.json_response(response)
+            response = genJsonResponse(url, detailed, msgs)
+            return web.json_response(response, status=status, headers=headers)
         else:
             logging.info('Returning HTML response for url: {}'.format(url))
-            return web.Response(text=genFullHtmlResponse(url), content_type='text/html')
+            return web.Response(text=genFullHtmlResponse(url, msgs), content_type='text/html', status=status, headers=headers)
     else:
         if format == 'json':
             logging.info('Returning empty JSON response.')
@@ -172,12 +554,194 @@ def sync_request_handler(request):
             return web.Response(text=genEmptyHtmlResponse(), content_type='text/html')
 
 
-async def request_handler(request):
-    """Async request handler. Submits the incoming request to the thread pool to be handled."""
-    return (await loop.run_in_executor(None, sync_request_handler, request))  # Submits the request to a handler inside the threadpool
+async def stats_handler(request):
+    """Returns the request counters of all workers, and the coalescing, queue and cache counters of the one serving it, as JSON."""
+    totals = stats.totals()
+    return web.json_response({
+        'requests': totals['requests'],
+        'tasks': totals['tasks'],
+        'analyses': totals['analyses'],
+        'coalesced': totals['coalesced'],
+        'failed': totals['failed'],
+        'rejected': totals['rejected'],
+        'limited': totals['limited'],
+        'workers': stats.slots,
+        'restarts': totals['restarts'],
+        'worker': {'pid': os.getpid(), 'slot': stats.slot, 'requests': stats['requests'], 'tasks': stats['tasks'], 'analyses': stats['analyses']},
+        'inFlight': len(inFlight),
+        'rateLimiter': rateLimiter.stats(),
+        'queues': {'fetch': fetchGate.stats(), 'analysis': analysisGate.stats()},
+        'logCache': analyze.logCache.stats(),
+        'missingCache': analyze.missingCache.stats(),
+        'revalidations': fetchers.revalidationStats,
+        'resultCache': analyze.resultCache.stats(),
+        'logStore': fetchers.logStore.stats() if fetchers.logStore is not None else None,
+        'connections': connectionStats.stats(),
+    })
+
+
+class ConnectionStats(object):
+    """Counts the requests of an aiohttp session per host, the connections it opened for them and how many reused an open one."""
+
+    def __init__(self):
+        self.hosts = {}
+        self.trace = aiohttp.TraceConfig()
+        self.trace.on_request_start.append(self.onRequest)
+        self.trace.on_connection_create_end.append(self.onConnection)
+        self.trace.on_connection_reuseconn.append(self.onReuse)
+
+    def entry(self, host):
+        return self.hosts.setdefault(host, {'requests': 0, 'connections': 0, 'reused': 0})
+
+    async def onRequest(self, session, context, params):
+        context.host = str(params.url.origin())
+        self.entry(context.host)['requests'] += 1
+
+    async def onConnection(self, session, context, params):
+        self.entry(context.host)['connections'] += 1
+
+    async def onReuse(self, session, context, params):
+        self.entry(context.host)['reused'] += 1
+
+    def stats(self):
+        return {host: dict(counts) for host, counts in self.hosts.items()}
+
+
+connectionStats = ConnectionStats()
+
+
+async def openHttpSession(app):
+    """Creates the aiohttp session all downloads share."""
+    options = app['httpOptions']
+    app['httpSession'] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=options['maxFetches'], limit_per_host=options['poolSize'], keepalive_timeout=options['keepalive']),
+        trace_configs=[connectionStats.trace],
+        # A host trickling a log in just faster than the read timeout must not hold a download slot and its waiters for long
+        timeout=aiohttp.ClientTimeout(total=options['connectTimeout'] + 4 * options['readTimeout'],
+                                      sock_connect=options['connectTimeout'], sock_read=options['readTimeout']))
+
+
+async def closeHttpSession(app):
+    await app['httpSession'].close()
+
+
+def runServer(flags, sock=None):
+    """Serves requests until interrupted, on flags.host and flags.port or on the listening socket sock."""
+    global loop, analysisPool, analysisProcesses, fetchGate, analysisGate, rateLimiter
+    if sock is not None:  # A forked worker must not share the event loop of the parent
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    analysisProcesses = flags.analysisProcesses
+    if analysisProcesses is None:  # Prefork workers already spread the analyses over the cores
+        analysisProcesses = (os.cpu_count() or 1) if flags.workers <= 1 else 0
+    if analysisProcesses > 0:
+        analysisPool = analyze.startAnalysisPool(analysisProcesses)
+    fetchGate = Gate('fetch', flags.maxFetches, flags.fetchQueue)
+    classes = {name: JobClass(weight=flags.classWeights.get(name, 1), limit=flags.classLimits.get(name),
+                              queue=flags.classQueues.get(name, flags.analysisQueue)) for name in jobClasses}
+    rateLimiter = RateLimiter(flags.rate, flags.burst, maxClients=flags.rateClients, keys=flags.apiKeys)
+    analysisGate = Gate('analysis', analysisProcesses or (os.cpu_count() or 1), classes=classes)
+    loop.set_default_executor(threadPool)  # Set the default executor to our thread pool
+    app['httpOptions'] = {'maxFetches': flags.maxFetches, 'poolSize': flags.poolSize, 'keepalive': flags.keepalive, 'connectTimeout': flags.connectTimeout, 'readTimeout': flags.readTimeout}
+    app.on_startup.append(openHttpSession)
+    app.on_cleanup.append(closeHttpSession)
+    app.add_routes([web.get('/', request_handler), web.get('/stats', stats_handler)])
+    if sock is None:
+        applicationTask = loop.create_task(web._run_app(app, host=flags.host, port=flags.port, print=logging.info))
+    else:
+        applicationTask = loop.create_task(web._run_app(app, sock=sock, print=None))
+    try:
+        loop.run_forever()
+    except (KeyboardInterrupt, web.GracefulExit):  # Ctrl-C, or SIGTERM as handled by aiohttp
+        pass
+    finally:
+        logging.info('Exiting application.')
+        applicationTask.cancel()  # Shuts down the HTTP server
+        try:
+            loop.run_until_complete(applicationTask)  # Lets it run its cleanup
+        except asyncio.CancelledError:
+            pass
+        threadPool.shutdown()  # Shuts down the running thread pool
+        if analysisPool is not None:
+            analysisPool.shutdown()
+        logging.info('Requests: {requests} served, {tasks} pastes fetched, {analyses} analyses run, {coalesced} coalesced into a running one, {failed} failed downloads, {rejected} rejected, {limited} rate limited'.format(**stats))
+        for host, counts in connectionStats.stats().items():
+            logging.info('Connections to {}: {connections} opened, {reused} of {requests} requests reused one'.format(host, **counts))
+        logging.info('Log cache: {hits} hits, {misses} misses, {evictions} evictions, {entries} logs in {bytes} bytes'.format(**analyze.logCache.stats()))
+        logging.info('Revalidations: {notModified} unchanged, {modified} changed'.format(**fetchers.revalidationStats))
+        if fetchers.logStore is not None:
+            logging.info('Log store: {hits} hits, {misses} misses, {writes} logs written, {removals} removed, {bytes} bytes'.format(**fetchers.logStore.stats()))
+        logging.info('Result cache: {hits} hits, {misses} misses, {evictions} evictions, {entries} results in {bytes} bytes'.format(**analyze.resultCache.stats()))
+
+
+def superviseWorkers(flags):
+    """Forks flags.workers processes serving requests on one listening socket, and restarts any that exits until interrupted."""
+    sock = socket.create_server((flags.host, flags.port), backlog=128)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # Stops the parent and, inherited, every worker like Ctrl-C
+    gc.freeze()  # Objects created so far are never collected, so the pages holding them stay shared with the workers
+    workers = {}  # Pid -> (slot, start time)
+
+    def start(slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                stats.slot = slot
+                runServer(flags, sock)
+                code = 0
+            except BaseException:
+                logging.exception('Worker failed')
+            finally:
+                os._exit(code)
+        workers[pid] = (slot, time.monotonic())
+
+    logging.info('======== Running on http://{}:{} with {} workers ========'.format(flags.host, flags.port, flags.workers))
+    try:
+        for slot in range(flags.workers):
+            start(slot)
+        while workers:
+            pid, status = os.wait()
+            if pid not in workers:
+                continue
+            slot, started = workers.pop(pid)
+            reason = 'signal {}'.format(os.WTERMSIG(status)) if os.WIFSIGNALED(status) else 'code {}'.format(os.WEXITSTATUS(status))
+            logging.warning('Worker {} exited with {}, restarting it'.format(pid, reason))
+            stats.add(slot, 'restarts')
+            if time.monotonic() - started < 1:  # Keeps a worker that fails on startup from being restarted in a tight loop
+                time.sleep(1)
+            start(slot)
+    except KeyboardInterrupt:
+        logging.info('Stopping workers.')
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+    finally:
+        sock.close()
+    totals = stats.totals()
+    logging.info('All workers: {requests} requests served, {tasks} pastes fetched, {analyses} analyses run, {coalesced} coalesced, {failed} failed downloads, {rejected} rejected, {limited} rate limited, {restarts} restarts'.format(**totals))
+
+
+def classOptions(value, minimum=0):
+    """Parses CLASS=N,... into {class: N} for the analysis classes html, detailed, json and batch."""
+    options = {}
+    for item in filter(None, value.split(',')):
+        name, sep, number = item.partition('=')
+        name = name.strip()
+        if name not in jobClasses or not number.strip().isdigit() or int(number) < minimum:
+            raise argparse.ArgumentTypeError(_("expected CLASS=N with N >= {} and CLASS one of {}: {}").format(minimum, ', '.join(jobClasses), item))
+        options[name] = int(number)
+    return options
 
 
 def main():
+    global stats
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] [%(funcName)s] %(message)s")
     aiohttpLogger = logging.getLogger('aiohttp')
     aiohttpLogger.setLevel(logging.WARNING)
@@ -192,19 +756,107 @@ def main():
     parser.add_argument(
         "--port", default="8080", type=int, help=_("port to bind to"), dest="port"
     )
+    parser.add_argument(
+        "--workers", default=1, type=int, help=_("number of server processes sharing the port"), dest="workers"
+    )
+    parser.add_argument(
+        "--analysis-processes", default=None, type=int,
+        help=_("number of processes each server process analyses logs in, 0 to analyse them in threads (default: one per CPU, or 0 with several workers)"),
+        dest="analysisProcesses"
+    )
+    parser.add_argument(
+        "--pool-size", default=0, type=int, help=_("number of connections to open per paste host, 0 for no limit besides --max-fetches"), dest="poolSize"
+    )
+    parser.add_argument(
+        "--keepalive", default=15, type=float, help=_("seconds to keep an idle connection to a paste host open"), dest="keepalive"
+    )
+    parser.add_argument(
+        "--cache-entries", default=128, type=int, help=_("number of downloaded logs to keep"), dest="cacheEntries"
+    )
+    parser.add_argument(
+        "--cache-mb", default=256, type=int, help=_("megabytes of downloaded logs to keep"), dest="cacheMB"
+    )
+    parser.add_argument(
+        "--result-cache-mb", default=32, type=int, help=_("megabytes of analysis results to keep"), dest="resultCacheMB"
+    )
+    parser.add_argument(
+        "--store", default=None, type=str, help=_("directory to keep downloaded logs in across restarts"), dest="store"
+    )
+    parser.add_argument(
+        "--store-mb", default=1024, type=int, help=_("megabytes of compressed logs to keep in the store"), dest="storeMB"
+    )
+    parser.add_argument(
+        "--store-compression", default="zlib", choices=["zlib", "lzma"], help=_("compression of newly stored logs"), dest="storeCompression"
+    )
+    parser.add_argument(
+        "--max-log-mb", default=64, type=int, help=_("megabytes a downloaded log may have"), dest="maxLogMB"
+    )
+    parser.add_argument(
+        "--max-fetches", default=256, type=int, help=_("number of logs to download at once"), dest="maxFetches"
+    )
+    parser.add_argument(
+        "--fetch-queue", default=256, type=int, help=_("number of downloads to queue before answering 503"), dest="fetchQueue"
+    )
+    parser.add_argument(
+        "--analysis-queue", default=64, type=int, help=_("number of analyses of each class to queue before answering 503"), dest="analysisQueue"
+    )
+    parser.add_argument(
+        "--class-weights", default="html=8,detailed=4,json=2,batch=1", type=lambda value: classOptions(value, 1),
+        help=_("share of the analysis slots each class of request gets while several wait, as CLASS=N,..."), dest="classWeights"
+    )
+    parser.add_argument(
+        "--class-limits", default="", type=classOptions,
+        help=_("number of analyses of a class to run at once, as CLASS=N,... with 0 for no limit (default: no limit)"), dest="classLimits"
+    )
+    parser.add_argument(
+        "--class-queues", default="", type=classOptions,
+        help=_("number of analyses of a class to queue, as CLASS=N,... (default: --analysis-queue)"), dest="classQueues"
+    )
+    parser.add_argument(
+        "--connect-timeout", default=5, type=float, help=_("seconds to wait for a paste host to accept a connection"), dest="connectTimeout"
+    )
+    parser.add_argument(
+        "--read-timeout", default=30, type=float, help=_("seconds to wait for a paste host to send data; a whole download may take four times as long"), dest="readTimeout"
+    )
+    parser.add_argument(
+        "--rate", default=0, type=float,
+        help=_("logs per second a client may have analysed on average, 0 for no limit; behind a reverse proxy set --trusted-proxy too"), dest="rate"
+    )
+    parser.add_argument(
+        "--burst", default=30, type=float, help=_("logs a client may have analysed in a burst"), dest="burst"
+    )
+    parser.add_argument(
+        "--rate-clients", default=65536, type=int, help=_("number of clients to remember the rate of"), dest="rateClients"
+    )
+    parser.add_argument(
+        "--trusted-proxy", default=[], action="append", type=ipaddress.ip_network,
+        help=_("address or network of a reverse proxy whose X-Forwarded-For header is believed, may be repeated"), dest="trustedProxies"
+    )
+    parser.add_argument(
+        "--api-keys", default=None, type=str,
+        help=_("JSON file of API keys with their own rate, as {\"KEY\": {\"rate\": N, \"burst\": N}}, sent in the X-API-Key header"), dest="apiKeys"
+    )
     flags = parser.parse_args()
+    trustedProxies.extend(flags.trustedProxies)
+    if flags.apiKeys is not None:
+        try:
+            flags.apiKeys = loadApiKeys(flags.apiKeys)
+        except (OSError, ValueError, LookupError, TypeError, AttributeError) as e:
+            parser.error(_("cannot read --api-keys: {}").format(e))
 
-    loop.set_default_executor(threadPool)  # Set the default executor to our thread pool
-    app.add_routes([web.get('/', request_handler)])
-    applicationTask = loop.create_task(web._run_app(app, host=flags.host, port=flags.port, print=logging.info))
-    try:
-        loop.run_forever()
-    except KeyboardInterrupt:
-        pass
-    finally:
-        logging.info('Exiting application.')
-        applicationTask.cancel()  # Shuts down the HTTP server
-        threadPool.shutdown()  # Shuts down the running thread pool
+    analyze.configureLogCache(maxEntries=flags.cacheEntries, maxBytes=flags.cacheMB << 20)
+    analyze.resultCache.maxBytes = flags.resultCacheMB << 20
+    fetchers.maxLogBytes = flags.maxLogMB << 20
+    analyze.configureLogStore(flags.store, maxBytes=flags.storeMB << 20, compression=flags.storeCompression)
+
+    if flags.workers > 1:
+        if not hasattr(os, 'fork'):
+            parser.error(_("--workers needs a platform that can fork"))
+        logging.getLogger().handlers[0].setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] [%(process)d] [%(funcName)s] %(message)s"))
+        stats = Counters(flags.workers)
+        superviseWorkers(flags)
+    else:
+        runServer(flags)
 
 
 if __name__ == '__main__':
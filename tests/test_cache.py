@@ -0,0 +1,61 @@
+import unittest
+
+from checks.utils.cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+
+    def cache(self, **options):
+        return LRUCache(clock=lambda: self.now, **options)
+
+    def testTtl(self):
+        cache = self.cache()
+        cache.put('a', 'A', 1, ttl=60)
+        cache.put('b', 'B', 1)
+        self.assertEqual(cache.get('a'), 'A')
+        self.now += 60
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.getStale('a'), 'A')  # expired entries are kept until evicted
+        self.assertEqual(cache.get('b'), 'B')
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (2, 1))
+
+    def testPutReplaces(self):
+        cache = self.cache()
+        cache.put('a', 'A', 10, ttl=60)
+        self.now += 60
+        cache.put('a', 'A2', 3, ttl=60)
+        self.assertEqual(cache.get('a'), 'A2')
+        self.assertEqual((cache.stats()['entries'], cache.stats()['bytes']), (1, 3))
+
+    def testEvictsLeastRecentlyUsed(self):
+        cache = self.cache(maxEntries=2)
+        cache.put('a', 'A', 1)
+        cache.put('b', 'B', 1)
+        cache.get('a')
+        cache.put('c', 'C', 1)
+        self.assertIsNone(cache.getStale('b'))
+        self.assertEqual([cache.get(k) for k in 'ac'], ['A', 'C'])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def testEvictsBySize(self):
+        cache = self.cache(maxBytes=10)
+        cache.put('a', 'A', 4)
+        cache.put('b', 'B', 4)
+        cache.put('c', 'C', 4)
+        self.assertIsNone(cache.getStale('a'))
+        self.assertEqual(cache.stats()['bytes'], 8)
+        cache.put('huge', 'H', 11)  # larger than the cache, so never stored
+        self.assertIsNone(cache.getStale('huge'))
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def testDisabled(self):
+        cache = self.cache(maxEntries=0)
+        cache.put('a', 'A', 1)
+        self.assertIsNone(cache.get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
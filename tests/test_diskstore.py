@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from checks.utils.diskstore import LogStore
+from checks.utils.logbuffer import LogBuffer
+
+
+def makeLog(i):
+    return LogBuffer(os.urandom(2000).hex() + '\nlog {}'.format(i))
+
+
+class LogStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.now = 1000.0
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def store(self, **options):
+        return LogStore(self.path, clock=lambda: self.now, **options)
+
+    def age(self, store, days):
+        """Makes every object look unused for days."""
+        for mtime, size, path in store.objects():
+            os.utime(path, (mtime - days * 86400, mtime - days * 86400))
+
+    def testRoundTrip(self):
+        for compression in ('zlib', 'lzma'):
+            store = self.store(compression=compression)
+            log = makeLog(compression)
+            store.put('obs', compression, [0, 'DESCRIPTION', 'x'], log, {'etag': '"1"'})
+            description, stored = store.get('obs', compression)
+            self.assertEqual(description, [0, 'DESCRIPTION', 'x'])
+            self.assertEqual(list(stored), list(log))
+            self.assertEqual(store.validators('obs', compression), ({'etag': '"1"'}, log.digest()))
+        self.assertIsNone(store.get('obs', 'other'))
+        self.assertEqual((store.stats()['hits'], store.stats()['misses']), (1, 1))
+
+    def testTtl(self):
+        store = self.store()
+        store.put('gist', 'a', None, makeLog(0))
+        self.assertIsNotNone(store.get('gist', 'a', ttl=60))
+        self.now += 60
+        self.assertIsNone(store.get('gist', 'a', ttl=60))
+        self.assertIsNotNone(store.get('gist', 'a'))
+
+    def testSharedObject(self):
+        store = self.store()
+        log = makeLog(0)
+        store.put('obs', 'a', None, log)
+        store.put('haste', 'b', None, LogBuffer(str(log.data)))
+        self.assertEqual(len(store.objects()), 1)
+        self.assertEqual(store.stats()['writes'], 1)
+
+    def testDamagedObject(self):
+        store = self.store()
+        store.put('obs', 'a', None, makeLog(0))
+        for mtime, size, path in store.objects():
+            with open(path, 'wb') as f:
+                f.write(b'garbage')
+        self.assertIsNone(store.get('obs', 'a'))
+        self.assertEqual(store.objects(), [])
+
+    def testCollectsLeastRecentlyUsed(self):
+        store = self.store()
+        for i in range(4):
+            store.put('obs', str(i), None, makeLog(i))
+        size = sum(s for m, s, p in store.objects())
+        self.age(store, 1)
+        store.get('obs', '0')  # reading and storing again both count as use
+        store.put('obs', '1', None, store.get('obs', '1')[1])
+        store.maxBytes = size * 3 // 4
+        store.collect()
+        self.assertEqual([i for i in range(4) if store.get('obs', str(i))], [0, 1])
+        self.assertLessEqual(store.stats()['bytes'], store.maxBytes * store.lowWater)
+        self.assertEqual(len(store.entries()), 2)  # the index entries of removed logs are pruned too
+
+    def testCollectsOnPut(self):
+        store = self.store()
+        store.put('obs', '0', None, makeLog(0))
+        store.maxBytes = sum(s for m, s, p in store.objects()) * 3 // 2
+        self.age(store, 1)
+        store.put('obs', '1', None, makeLog(1))
+        self.assertIsNone(store.get('obs', '0'))
+        self.assertIsNotNone(store.get('obs', '1'))
+        self.assertEqual(store.stats()['removals'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+import simplehttp
+from simplehttp import Gate, JobClass, Overloaded
+
+
+def run(coroutine):
+    return simplehttp.loop.run_until_complete(coroutine)
+
+
+async def settle():
+    for i in range(5):
+        await asyncio.sleep(0)
+
+
+class GateTest(unittest.TestCase):
+
+    def testQueueBound(self):
+        async def main():
+            gate = Gate('analysis', 1, queue=1)
+            release = asyncio.Event()
+
+            async def job():
+                async with gate.slot():
+                    await release.wait()
+
+            tasks = [simplehttp.loop.create_task(job()) for i in range(2)]
+            await settle()
+            self.assertEqual((gate.active, len(gate.jobClass(None).waiting)), (1, 1))
+            with self.assertRaises(Overloaded) as raised:
+                gate.check()
+            self.assertGreaterEqual(raised.exception.retryAfter, 1)
+            release.set()
+            await asyncio.gather(*tasks)
+            gate.check()
+            self.assertEqual(gate.stats()['rejected'], 1)
+        run(main())
+
+    def testReserve(self):
+        async def main():
+            gate = Gate('analysis', 1, queue=1)
+            gate.reserve()
+            gate.reserve()  # one takes the free slot, the other the place in the queue
+            self.assertTrue(gate.full())
+            self.assertRaises(Overloaded, gate.reserve)
+            gate.unreserve()
+            self.assertFalse(gate.full())
+            async with gate.slot(reserved=True):  # never turned away, even with the queue full
+                self.assertEqual(gate.jobClass(None).pending, 0)
+            self.assertEqual(gate.active, 0)
+        run(main())
+
+    def testCancelledWaiterLeavesQueue(self):
+        async def main():
+            gate = Gate('analysis', 1, queue=1)
+            release = asyncio.Event()
+
+            async def job():
+                async with gate.slot():
+                    await release.wait()
+
+            first = simplehttp.loop.create_task(job())
+            second = simplehttp.loop.create_task(job())
+            await settle()
+            self.assertTrue(gate.full())
+            second.cancel()
+            await settle()
+            self.assertFalse(gate.full())
+            release.set()
+            await first
+            self.assertEqual(gate.active, 0)
+        run(main())
+
+    def testWeightedFairOrder(self):
+        async def main():
+            gate = Gate('analysis', 1, classes={'a': JobClass(weight=2, queue=10), 'b': JobClass(weight=1, queue=10)})
+            order = []
+            release = asyncio.Event()
+
+            async def job(name):
+                async with gate.slot(name):
+                    order.append(name)
+                    await release.wait()
+
+            blocker = simplehttp.loop.create_task(job('a'))
+            await settle()
+            tasks = [simplehttp.loop.create_task(job(name)) for name in 'aaaaaabbbbbb']
+            await settle()
+            release.set()
+            await asyncio.gather(blocker, *tasks)
+            self.assertEqual(order[1:7].count('a'), 4)  # twice the slots of b while both wait
+        run(main())
+
+    def testClassLimit(self):
+        async def main():
+            gate = Gate('analysis', 2, classes={'a': JobClass(limit=1, queue=1), 'b': JobClass(queue=1)})
+            release = asyncio.Event()
+
+            async def job(name):
+                async with gate.slot(name):
+                    await release.wait()
+
+            tasks = [simplehttp.loop.create_task(job(name)) for name in 'aab']
+            await settle()
+            self.assertEqual((gate.classes['a'].active, gate.classes['b'].active), (1, 1))
+            self.assertTrue(gate.full('a'))
+            release.set()
+            await asyncio.gather(*tasks)
+            self.assertEqual(gate.stats()['classes']['a']['admitted'], 2)
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
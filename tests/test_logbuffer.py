@@ -0,0 +1,89 @@
+import mmap
+import os
+import tempfile
+import unittest
+
+from checks.utils.fetchers import getLinesLocal
+from checks.utils.logbuffer import LogBuffer
+from checks.utils.registry import Check
+from checks.utils.stream import StreamAnalysis
+
+
+text = 'first line\nsecond ünïcode line\n\nlast line\n'
+
+
+class LogBufferTest(unittest.TestCase):
+
+    def testSplitsLikeStr(self):
+        for data in (text, text.encode('utf-8')):
+            buffer = LogBuffer(data)
+            self.assertEqual(list(buffer), text.split('\n'))
+            self.assertEqual(len(buffer), 5)
+            self.assertEqual(buffer[-1], '')
+            with self.assertRaises(IndexError):
+                buffer[5]
+
+    def testSlices(self):
+        for data in (text, text.encode('utf-8')):
+            buffer = LogBuffer(data)
+            self.assertEqual(list(buffer[1:3]), ['second ünïcode line', ''])
+            self.assertEqual(list(buffer[3:1]), [])
+            self.assertEqual(buffer[::2], ['first line', '', ''])
+            self.assertEqual(buffer[1:].find('line'), data.find(buffer.encode('line'), len('first line')))
+
+    def testCarriageReturns(self):
+        crlf = text.replace('\n', '\r\n')
+        for data in (crlf, crlf.encode('utf-8')):
+            buffer = LogBuffer(data)
+            self.assertEqual(list(buffer), text.split('\n'))
+            self.assertEqual(list(buffer[0:2]), ['first line', 'second ünïcode line'])
+        self.assertEqual(list(LogBuffer('no newline\r')), ['no newline'])
+
+    def testDigestIgnoresStorage(self):
+        self.assertEqual(LogBuffer(text).digest(), LogBuffer(text.encode('utf-8')).digest())
+        self.assertNotEqual(LogBuffer(text).digest(), LogBuffer(text + 'x').digest())
+
+    def testFromLines(self):
+        self.assertEqual(list(LogBuffer.fromLines(['a\n', 'b'])), ['a', 'b'])
+        self.assertEqual(len(LogBuffer.fromLines([])), 0)
+
+    def testLineNumberAt(self):
+        buffer = LogBuffer(text)
+        self.assertEqual(buffer.lineNumberAt(0), 0)
+        self.assertEqual(buffer.lineNumberAt(text.index('second')), 1)
+        self.assertEqual(buffer.lineNumberAt(len(text)), 4)
+
+
+class LocalFileTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(text.replace('\n', '\r\n').encode('utf-8'))
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def testMappedCrlf(self):
+        buffer = getLinesLocal(self.path)
+        self.assertIsInstance(buffer.data, mmap.mmap)
+        self.assertEqual(list(buffer), text.split('\n'))
+        buffer.close()
+        self.assertTrue(buffer.data.closed)
+
+    def testStreamedCrlf(self):
+        stream = StreamAnalysis(checks=[Check(lambda lines: None)])  # a check without a consumer keeps the lines
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            for line in f:
+                stream.feed(line)
+        self.assertEqual(list(stream.close()), text.split('\n'))
+
+    def testEmptyAndMissingFiles(self):
+        with open(self.path, 'wb'):
+            pass
+        self.assertEqual(list(getLinesLocal(self.path)), [''])
+        self.assertIsNone(getLinesLocal(self.path + '.missing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from checks.utils.logindex import LogIndex, sectionDivider, subSectionDivider
+
+
+LOG = [
+    '12:00:00.000: CPU Name: Some CPU',
+    '12:00:00.000: OS Name: Windows 10',
+    '12:00:00.001: ' + subSectionDivider,
+    '12:00:00.002: Loaded Modules:',
+    '12:00:00.002:   obs-x264.dll',
+    '12:00:00.002: ' + subSectionDivider,
+    '12:00:01.000: == Recording Start ==',
+    '12:00:02.000: Video stopped, number of skipped frames due to encoding lag: 0/100 (0.0%)',
+    '12:00:03.000: == Recording Stop ==',
+    '12:00:04.000: == Streaming Start ==',
+    '12:00:05.000: ' + sectionDivider,
+    '12:00:05.000: - scene \'Scene\':',
+    '12:00:05.000:     - source: \'Display\' (monitor_capture)',
+    '12:00:05.000: ' + sectionDivider,
+]
+
+
+class LogIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LogIndex(LOG)
+
+    def testBehavesLikeLines(self):
+        self.assertEqual(len(self.index), len(LOG))
+        self.assertEqual(list(self.index), LOG)
+        self.assertEqual(self.index[1], LOG[1])
+        self.assertEqual(list(self.index[2:4]), LOG[2:4])
+
+    def testLineNumbers(self):
+        self.assertEqual(self.index.lineNumbers(subSectionDivider), [2, 5, 10, 13])
+        self.assertEqual(self.index.lineNumbers('Start =='), [6, 9])
+        self.assertEqual(self.index.lineNumbers('not there'), [])
+        self.assertIs(self.index.lineNumbers('Start =='), self.index.postings['Start =='])
+        self.assertEqual(self.index.firstLineNumber('Name:'), 0)
+        self.assertIsNone(self.index.firstLineNumber('not there'))
+
+    def testMatchesWithinLines(self):
+        index = LogIndex(['ab', 'cd'])
+        self.assertFalse(index.contains('b\nc'))
+        self.assertEqual(index.lineNumbers('b\nc'), [])
+        self.assertTrue(index.contains('cd'))
+
+    def testSearchMatchesListScan(self):
+        for term in ('Name', 'source', subSectionDivider, '12:00:0', ''):
+            self.assertEqual(self.index.search(term), [s for s in LOG if term in s])
+        self.assertEqual(self.index.searchWithIndex('OS Name'), [[LOG[1], 1]])
+        self.assertEqual(self.index.searchExclude('Recording', ['Stop']), [LOG[6]])
+
+    def testRegions(self):
+        self.assertEqual(list(self.index.region('header')), LOG[:2])
+        self.assertEqual(list(self.index.region('modules')), LOG[3:5])
+        self.assertEqual(list(self.index.region('scenes')), LOG[11:13])
+        self.assertIs(self.index.region('header').parent, self.index)
+        self.assertIs(self.index.region('header'), self.index.region('header'))
+        self.assertEqual(len(LogIndex(LOG[:2]).region('modules')), 0)
+        self.assertRaises(ValueError, self.index.region, 'footer')
+
+    def testSessions(self):
+        self.assertEqual(self.index.sessionBounds(), [(6, 9), (9, len(LOG))])
+        self.assertEqual(self.index.sessions()[0].search('skipped frames'), [LOG[7]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from checks.utils.logbuffer import LogBuffer
+from checks.utils.logindex import LogIndex
+from checks.utils.matcher import TermMatcher, ahocorasick
+
+
+terms = ['Windows Version:', 'wörld', 'abc', 'missing']
+text = 'héllo wörld\nabc Windows Version: 10\n\nxx é Windows Version: abc abc\n'
+
+
+class TermMatcherTest(unittest.TestCase):
+
+    def expected(self, buffer):
+        return {term: [i for i, line in enumerate(buffer) if term in line] for term in terms}
+
+    def checkScans(self, matcher):
+        for buffer in (LogBuffer(text), LogBuffer(text.encode('utf-8'))):
+            self.assertEqual(matcher.scan(buffer), self.expected(buffer))
+            self.assertEqual(matcher.scan(buffer[1:4]), self.expected(buffer[1:4]))
+
+    def testPurePython(self):
+        self.checkScans(TermMatcher(terms, accelerated=False))
+
+    @unittest.skipIf(ahocorasick is None, 'pyahocorasick is not installed')
+    def testAccelerated(self):
+        self.checkScans(TermMatcher(terms, accelerated=True))
+
+    @unittest.skipIf(ahocorasick is None, 'pyahocorasick is not installed')
+    def testAcceleratedChunks(self):
+        matcher = TermMatcher(terms, accelerated=True)
+        matcher.chunkSize = 4  # every line is a chunk of its own
+        self.checkScans(matcher)
+
+    def testPrimedIndexOverBytes(self):
+        index = LogIndex(LogBuffer(text.encode('utf-8')))
+        index.prime(TermMatcher(terms))
+        self.assertEqual(index.search('Windows Version:'), ['abc Windows Version: 10', 'xx é Windows Version: abc abc'])
+        self.assertFalse(index.contains('missing'))
+
+    def testNoTerms(self):
+        self.assertEqual(TermMatcher([]).scan(LogBuffer(text)), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import ipaddress
+import unittest
+from types import SimpleNamespace
+
+from multidict import CIMultiDict
+
+import simplehttp
+from simplehttp import RateLimiter, clientAddress
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+
+    def limiter(self, *args, **options):
+        return RateLimiter(*args, clock=lambda: self.now, **options)
+
+    def testBurstThenRate(self):
+        limiter = self.limiter(2, 3)
+        self.assertEqual([limiter.take('1.2.3.4') for i in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.take('1.2.3.4'), 0.5)
+        self.assertEqual(limiter.take('5.6.7.8'), 0)  # every client has its own bucket
+        self.now += 0.5
+        self.assertEqual(limiter.take('1.2.3.4'), 0)
+        self.now += 10
+        self.assertEqual([limiter.take('1.2.3.4') for i in range(3)], [0, 0, 0])
+        self.assertGreater(limiter.take('1.2.3.4'), 0)  # refills up to burst only
+        self.assertEqual(limiter.stats()['limited'], 2)
+
+    def testApiKeys(self):
+        limiter = self.limiter(1, 1, keys={'KEY': (10, 5)})
+        self.assertEqual([limiter.take('1.2.3.4', 'KEY') for i in range(5)], [0] * 5)
+        self.assertAlmostEqual(limiter.take('1.2.3.4', 'KEY'), 0.1)
+        self.assertEqual(limiter.take('1.2.3.4', 'OTHER'), 0)  # unknown keys are limited by address
+        self.assertGreater(limiter.take('1.2.3.4'), 0)
+
+    def testDisabled(self):
+        limiter = self.limiter(0, 0)
+        self.assertEqual([limiter.take('1.2.3.4') for i in range(100)], [0] * 100)
+        self.assertEqual(limiter.stats()['clients'], 0)
+
+    def testForgetsLeastRecentClients(self):
+        limiter = self.limiter(1, 1, maxClients=2)
+        for address in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+            limiter.take(address)
+        self.assertEqual((limiter.stats()['clients'], limiter.stats()['evictions']), (2, 1))
+        self.assertEqual(limiter.take('1.1.1.1'), 0)  # starts with a full bucket again
+        self.assertGreater(limiter.take('3.3.3.3'), 0)
+
+
+class ClientAddressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trustedProxies = list(simplehttp.trustedProxies)
+        simplehttp.trustedProxies[:] = [ipaddress.ip_network('10.0.0.0/8'), ipaddress.ip_network('::1')]
+
+    def tearDown(self):
+        simplehttp.trustedProxies[:] = self.trustedProxies
+
+    def request(self, remote, *forwardedFor):
+        return SimpleNamespace(remote=remote, headers=CIMultiDict(('X-Forwarded-For', value) for value in forwardedFor))
+
+    def testUntrustedPeer(self):
+        self.assertEqual(clientAddress(self.request('1.2.3.4', '5.6.7.8')), '1.2.3.4')
+
+    def testTrustedProxy(self):
+        self.assertEqual(clientAddress(self.request('10.0.0.1', '5.6.7.8')), '5.6.7.8')
+        self.assertEqual(clientAddress(self.request('::1', '5.6.7.8')), '5.6.7.8')
+        self.assertEqual(clientAddress(self.request('10.0.0.1')), '10.0.0.1')
+
+    def testSkipsForgedHops(self):
+        self.assertEqual(clientAddress(self.request('10.0.0.1', 'forged, 5.6.7.8', '10.0.0.2')), '5.6.7.8')
+        self.assertEqual(clientAddress(self.request('10.0.0.1', '10.0.0.3, 10.0.0.2')), '10.0.0.3')
+
+    def testUnixSocket(self):
+        self.assertIsNone(clientAddress(self.request(None, '5.6.7.8')))
+
+
+if __name__ == '__main__':
+    unittest.main()